@@ -6,10 +6,19 @@ file handling, and databases.
 Imports:
 - **FastAPI**: The core FastAPI class to create and configure the API.
 - **Request**: Used to handle HTTP requests in FastAPI routes.
-- **pickle**: A module for serializing and deserializing Python objects to and 
-from byte streams.
+- **Response**: Used to return binary (Arrow) payloads from FastAPI routes.
+- **dataset**: Opens the memory-mapped Arrow dataset (open_dataset) shared with
+the frontend.
+- **indexes**: In-memory indexes over the dataset (FlightIndex, CellIndex) used to
+answer flight track and hex-click lookups with binary searches.
 - **utils**: Custom utility functions for converting cell data to bounding boxes 
-(cellToBbox) and creating DataFrames (make_dfs).
+(cellToBbox).
+- **workers**: Bounded pool of worker processes (MapRenderPool) that render /map
+responses off the event loop.
+- **candidates**: Scores every H3 cell as an airport candidate in one vectorized
+pass (score_cells, rank_candidates).
+- **cache**: Memory-bounded response cache (ResponseCache) and file versioning
+(file_version) used to serve repeated /map requests and ETags.
 - **os**: Provides a way to interact with the operating system, including file 
 and directory management.
 - **sentinelhub.SHConfig**: Configuration class to set up Sentinel Hub access.
@@ -18,15 +27,36 @@ and directory management.
     - **BBox**: A class to define bounding boxes used for spatial queries.
     - **bbox_to_dimensions**: A utility function to calculate image 
     dimensions from bounding box coordinates.
-- **sqlite3**: A module for interacting with SQLite databases, 
-allowing queries and database management.
+- **db**: Pool of read-only SQLite connections (db_pool) shared across
+FastAPI's threadpool.
 - **json**: A module to parse and handle JSON data.
 """
 import os
-import pickle
-import sqlite3
-from fastapi import FastAPI, Request
-from utils import cellToBbox, make_dfs
+import json
+import asyncio
+import datetime
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+import h3
+import numpy as np
+import pandas as pd
+from cache import ResponseCache, etag_matches, file_version
+from candidates import rank_candidates, score_cells
+from dataset import H3_COLUMN, h3_descendant_range, h3_to_str, open_dataset
+from db import db_pool
+from indexes import CellIndex, FlightIndex, to_utc_nanoseconds
+from utils import (
+    ARROW_MEDIA_TYPE,
+    MAP_IDS_MEDIA_TYPE,
+    MAP_RESOLUTIONS,
+    cellToBbox,
+    max_resolution_for_zoom,
+)
+from workers import MAP_RETRY_AFTER, MAP_TIMEOUT, MapRenderPool
 from sentinelhub import SHConfig
 from sentinelhub import (
     CRS,
@@ -46,31 +76,509 @@ config.sh_client_id = CLIENT_ID
 config.sh_client_secret = CLIENT_SECRET
 config.save("my-profile")
 
-"""Unpickling data sets"""
+"""Loading the data set"""
+
+DATASET_PATH = os.environ.get("ADSB_DATASET", "adsb_data.arrow")
+LEGACY_PICKLE = "gdf_all_res.pkl"
+
+
+def load_dataset():
+    # The backend owns the file: it converts the old pickle the first time the
+    # Arrow file is missing, and old layouts, before the map workers open it
+    return open_dataset(DATASET_PATH, legacy_pickle=LEGACY_PICKLE, convert=True)
+
+
+dataset = load_dataset()
+dataset_version = file_version(DATASET_PATH)
+
+flight_index = FlightIndex(dataset)
+
+# One CellIndex per resolution, built the first time a resolution is queried
+cell_indexes = {}
+
+# Airport-candidate scores per (resolution, distance), computed on first request
+# and kept for the most recently used CANDIDATE_CACHE_ENTRIES keys
+CANDIDATE_CACHE_ENTRIES = int(os.environ.get("CANDIDATE_CACHE_ENTRIES", 16))
+candidate_scores = OrderedDict()
+
+"""Map response cache"""
+
+MAP_CACHE_BYTES = int(os.environ.get("MAP_CACHE_BYTES", 256 * 1024 * 1024))
+
+map_cache = ResponseCache(MAP_CACHE_BYTES)
+dataset_lock = threading.Lock()
+# Held while a new dataset version is loaded, so only one request loads it
+reload_lock = threading.Lock()
+
+
+def refresh_dataset():
+    """
+    Reloads the dataset and its indexes when the dataset file has changed on disk.
+
+    The new dataset and its flight index are built before they are swapped in,
+    and requests arriving while another request loads them keep using the
+    current dataset instead of waiting. Called from the threadpool, never from
+    the event loop.
 
-with open("gdf_all_res.pkl", "rb") as f:  # resolution = 10
-    gdf = pickle.load(f)
+    Map responses are cached per dataset version, and the map workers reload
+    their own copy when they see the new version.
+    """
+    global dataset, flight_index, cell_indexes, candidate_scores, dataset_version
 
-"""SQLITE3 Databse conversion"""
+    if file_version(DATASET_PATH) == dataset_version:
+        return
+    if not reload_lock.acquire(blocking=False):
+        return
+    try:
+        version = file_version(DATASET_PATH)
+        if version == dataset_version:
+            return
+        new_dataset = load_dataset()
+        new_flight_index = FlightIndex(new_dataset)
+        with dataset_lock:
+            dataset = new_dataset
+            flight_index = new_flight_index
+            cell_indexes = {}
+            candidate_scores = OrderedDict()
+            dataset_version = version
+        map_cache.clear()
+    finally:
+        reload_lock.release()
+
+
+def dataset_snapshot():
+    """
+    Takes the current dataset together with its flight index and cell indexes.
 
+    A reload swaps them while holding dataset_lock. A request that only uses
+    this snapshot never applies row numbers of one version to the table of another.
 
-def get_db_connection():
-    conn = sqlite3.connect("adsb_data.db")
-    conn.row_factory = sqlite3.Row  # To get rows as dictionaries
-    return conn
+    Returns:
+        A tuple of (dataset, flight_index, cell_indexes).
+    """
+    with dataset_lock:
+        return dataset, flight_index, cell_indexes
 
 
 """Fast API"""
 
-app = FastAPI()
+# Map rendering runs in worker processes, started with the app
+map_pool = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global map_pool
+    map_pool = MapRenderPool(DATASET_PATH, dataset_version)
+    yield
+    map_pool.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+EXPANDED_PAGE_SIZE = 1000
+EXPANDED_MAX_PAGE_SIZE = 10000
+
+
+def time_range(start, end):
+    """
+    Parses the start and end query parameters of a time filter.
+
+    Args:
+        start: First date or timestamp to include (UTC if naive), or None.
+        end: Last date or timestamp to include (UTC if naive), or None. A date
+            covers the whole day.
+
+    Returns:
+        A tuple of (start, end) in UTC nanoseconds, either None if not given.
+        The end is exclusive: the next day for dates, the next microsecond otherwise.
+
+    Raises:
+        HTTPException: If start or end is not a date or timestamp.
+    """
+    try:
+        start_ns = to_utc_nanoseconds(start) if start else None
+        end_ns = to_utc_nanoseconds(end) if end else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    if end_ns is not None:
+        try:
+            datetime.date.fromisoformat(end)
+            end_ns += 86_400_000_000_000
+        except ValueError:
+            end_ns += 1_000
+    return start_ns, end_ns
+
+
+def sql_timestamp(nanoseconds):
+    """
+    Formats UTC nanoseconds like the `timestamp` text of the gdf_expanded table.
+
+    Args:
+        nanoseconds: Nanoseconds since the epoch.
+
+    Returns:
+        A string such as "2024-11-05 07:40:34+00:00", which sorts with the stored ones.
+    """
+    return str(pd.Timestamp(nanoseconds, tz="UTC"))
+
+
+def expanded_query(conn, columns, flight, start, end, cell, bbox, cursor, limit):
+    """
+    Builds the SQL for a filtered, projected page of the gdf_expanded table.
+
+    Args:
+        conn: A pooled SQLite connection, used to look up the table's columns.
+        columns: Comma separated column names to return, or None for all columns.
+        flight: Only return rows of this flight.
+        start: Only return rows with a timestamp at or after this date or timestamp.
+        end: Only return rows with a timestamp at or before this date or
+            timestamp. A date covers the whole day.
+        cell: Only return rows inside this H3 cell (at the cell's own resolution).
+        bbox: "min_lon,min_lat,max_lon,max_lat" to only return rows inside.
+        cursor: Only return rows after this rowid.
+        limit: Maximum number of rows to return, or None for no limit.
+
+    Returns:
+        A tuple of (sql, parameters).
+
+    Raises:
+        HTTPException: If a column, time, cell or bbox is invalid.
+    """
+    table_columns = db_pool.table_columns(conn, "gdf_expanded")
+
+    if columns:
+        selected = [column.strip() for column in columns.split(",") if column.strip()]
+        unknown = [column for column in selected if column not in table_columns]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown columns: {unknown}")
+    else:
+        selected = table_columns
+
+    where = []
+    parameters = []
+    if cursor is not None:
+        where.append("rowid > ?")
+        parameters.append(cursor)
+    if flight is not None:
+        where.append('"flight" = ?')
+        parameters.append(flight)
+    # Timestamps are stored as text, compared in the same format
+    start_ns, end_ns = time_range(start, end)
+    if start_ns is not None:
+        where.append('"timestamp" >= ?')
+        parameters.append(sql_timestamp(start_ns))
+    if end_ns is not None:
+        where.append('"timestamp" < ?')
+        parameters.append(sql_timestamp(end_ns))
+    if cell is not None:
+        if not h3.is_valid_cell(cell):
+            raise HTTPException(status_code=400, detail=f"Invalid H3 cell: {cell}")
+        # Rows store their finest cell, and a cell's descendants are one range
+        where.append(f'"{H3_COLUMN}" BETWEEN ? AND ?')
+        parameters.extend(h3_descendant_range(h3.str_to_int(cell)))
+    if bbox is not None:
+        try:
+            min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(","))
+        except ValueError as e:
+            raise HTTPException(
+                status_code=400, detail="bbox must be min_lon,min_lat,max_lon,max_lat"
+            ) from e
+        where.append('"lon" BETWEEN ? AND ? AND "lat" BETWEEN ? AND ?')
+        parameters.extend([min_lon, max_lon, min_lat, max_lat])
+
+    select_list = ", ".join(f'"{column}"' for column in selected)
+    sql = f"SELECT rowid AS _rowid, {select_list} FROM 'gdf_expanded'"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY rowid"
+    if limit is not None:
+        sql += " LIMIT ?"
+        parameters.append(limit)
+    return sql, parameters
+
+
+def expanded_row(row):
+    """
+    Converts a gdf_expanded row to a JSON-ready dict.
+
+    Args:
+        row: A sqlite3.Row.
+
+    Returns:
+        The row as a dict, with `h3_cell` as a hex string like the other H3 IDs
+        (64-bit integers do not survive JavaScript JSON parsers).
+    """
+    row = dict(row)
+    if row.get(H3_COLUMN) is not None:
+        row[H3_COLUMN] = format(row[H3_COLUMN], "x")
+    return row
+
+
+def stream_ndjson(sql, parameters):
+    """
+    Yields the rows of a query as newline-delimited JSON, a batch at a time.
+
+    The pooled connection is acquired on the first row and released once the
+    rows are exhausted or the stream is closed, so a response that is never
+    started holds no connection.
+
+    Args:
+        sql: The query to run.
+        parameters: The query parameters.
+
+    Yields:
+        One JSON encoded row per line.
+    """
+    conn = db_pool.acquire()
+    rows = None
+    try:
+        rows = conn.execute(sql, parameters)
+        while batch := rows.fetchmany(EXPANDED_PAGE_SIZE):
+            yield "".join(json.dumps(expanded_row(row)) + "\n" for row in batch)
+    finally:
+        if rows is not None:
+            rows.close()
+        db_pool.release(conn)
 
 
 @app.get("/data/gdf_expanded")
-def get_expanded_data():
-    conn = get_db_connection()
-    data = conn.execute("SELECT * FROM 'gdf_expanded'").fetchall()
-    conn.close()
-    return [dict(row) for row in data]
+def get_expanded_data(
+    columns: str | None = None,
+    flight: str | None = None,
+    start: str | None = None,
+    end: str | None = None,
+    cell: str | None = None,
+    bbox: str | None = None,
+    cursor: int | None = None,
+    limit: int | None = Query(None, ge=1, le=EXPANDED_MAX_PAGE_SIZE),
+    response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+):
+    """
+    Returns rows of the gdf_expanded table, filtered and paginated in SQL.
+
+    Args:
+        columns: Comma separated column names to return (default: all).
+        flight: Only return rows of this flight.
+        start: Only return rows with a timestamp at or after this date or
+            timestamp (UTC if naive).
+        end: Only return rows with a timestamp at or before this date or
+            timestamp (UTC if naive). A date covers the whole day.
+        cell: Only return rows inside this H3 cell.
+        bbox: "min_lon,min_lat,max_lon,max_lat" to only return rows inside.
+        cursor: The "next_cursor" of the previous page.
+        limit: Page size (default 1000, at most 10000). In ndjson mode rows are
+            streamed without a limit unless one is given.
+        response_format: The "format" query parameter, "json" for a page or
+            "ndjson" to stream every matching row.
+
+    Returns
+        dict:
+            - "rows": The rows of this page, with an "_rowid" column.
+            - "next_cursor": The cursor of the next page, or None on the last page.
+        Or, with format=ndjson, a stream of one JSON row per line.
+    """
+    if response_format == "json" and limit is None:
+        limit = EXPANDED_PAGE_SIZE
+
+    conn = db_pool.acquire()
+    try:
+        sql, parameters = expanded_query(
+            conn, columns, flight, start, end, cell, bbox, cursor, limit
+        )
+        if response_format == "json":
+            rows = [expanded_row(row) for row in conn.execute(sql, parameters)]
+    finally:
+        db_pool.release(conn)
+
+    if response_format == "ndjson":
+        return StreamingResponse(
+            stream_ndjson(sql, parameters), media_type="application/x-ndjson"
+        )
+
+    next_cursor = rows[-1]["_rowid"] if len(rows) == limit else None
+    return {"rows": rows, "next_cursor": next_cursor}
+
+
+TRACK_COLUMNS = ["timestamp", "lat", "lon", "alt_baro", "gs", "type", "flight"]
+
+
+@app.get("/flights/{flight}/track")
+def get_flight_track(
+    flight: str,
+    aircraft_type: str | None = Query(None, alias="type"),
+    start: str | None = None,
+    end: str | None = None,
+    resolution: int | None = Query(None, ge=6, le=11),
+):
+    """
+    Returns the observations of one flight in time order.
+
+    Args:
+        flight: The flight ID.
+        aircraft_type: The "type" query parameter, only return observations of
+            this aircraft type.
+        start: First date or timestamp to return (inclusive, UTC).
+        end: Last date or timestamp to return (inclusive, UTC). A date covers
+            the whole day.
+        resolution: Also return the H3 cell of each observation at this resolution.
+
+    Returns
+        dict:
+            - "dates": Every date the flight (of this type) was observed on.
+            - "track": The observations between start and end, each with
+              "time_from_start" in hours since the first returned observation.
+    """
+    refresh_dataset()
+
+    columns = TRACK_COLUMNS.copy()
+    if resolution is not None:
+        columns.append(f"H3_{resolution}_cell")
+
+    start_ns, end_ns = time_range(start, end)
+    current, index, _ = dataset_snapshot()
+
+    flight_df = current.take(index.rows(flight), ["timestamp", "type"])
+    if aircraft_type is not None:
+        flight_df = flight_df[flight_df["type"] == aircraft_type]
+    dates = sorted({str(date) for date in flight_df["timestamp"].dt.date})
+
+    track = current.take(index.rows(flight, start_ns, end_ns), columns)
+    if aircraft_type is not None:
+        track = track[track["type"] == aircraft_type]
+    if resolution is not None:
+        track[columns[-1]] = h3_to_str(track[columns[-1]])
+    track["time_from_start"] = (
+        track["timestamp"] - track["timestamp"].min()
+    ).dt.total_seconds() / 3600
+
+    return {
+        "dates": dates,
+        "track": json.loads(track.to_json(orient="records", date_format="iso")),
+    }
+
+
+def get_cell_index(current, indexes, resolution):
+    """
+    Returns the CellIndex of a resolution, building it on first use.
+
+    The index is built without holding dataset_lock, and only stored in the
+    cell indexes of the dataset it was built from.
+
+    Args:
+        current: The dataset of a `dataset_snapshot`.
+        indexes: The cell indexes of the same snapshot.
+        resolution: The H3 resolution.
+
+    Returns:
+        The CellIndex of `current` at that resolution.
+    """
+    index = indexes.get(resolution)
+    if index is None:
+        index = CellIndex(current, resolution)
+        with dataset_lock:
+            index = indexes.setdefault(resolution, index)
+    return index
+
+
+@app.get("/cells/flights")
+def get_cell_flights(
+    cells: list[str] = Query(...),
+    resolution: int = Query(..., ge=6, le=11),
+):
+    """
+    Looks up the flights observed in one or more H3 cells.
+
+    Args:
+        cells: The selected H3 cell IDs (repeat the parameter for several cells).
+        resolution: The H3 resolution of the cells.
+
+    Returns
+        dict:
+            - "flights": The flights observed in any of the cells.
+            - "types": The aircraft types observed in any of the cells.
+            - "observations": Total observations of those flights over the whole
+              dataset, per flight and type, most observed first.
+    """
+    refresh_dataset()
+
+    current, index, indexes = dataset_snapshot()
+
+    rows = np.sort(get_cell_index(current, indexes, resolution).rows(cells))
+    in_cells = current.take(rows, ["flight", "type"])
+    flights = in_cells["flight"].dropna().unique().tolist()
+
+    return {
+        "flights": flights,
+        "types": in_cells["type"].dropna().unique().tolist(),
+        "observations": index.observations(flights).to_dict(orient="records"),
+    }
+
+
+CANDIDATES_MAX_LIMIT = 1000
+
+
+def get_candidate_scores(resolution, distance):
+    """
+    Returns the airport-candidate scores of a resolution and distance, scoring on first use.
+
+    Args:
+        resolution: The H3 resolution.
+        distance: Maximum distance in miles, as on the map.
+
+    Returns:
+        The DataFrame from `score_cells` for the current dataset.
+    """
+    scores = candidate_scores
+    current = dataset
+    key = (resolution, distance)
+    with dataset_lock:
+        if key in scores:
+            scores.move_to_end(key)
+            return scores[key]
+
+    # Scored without the lock, so other requests are not held up meanwhile
+    scored = score_cells(current, resolution, max_distance=distance / 69)
+    with dataset_lock:
+        scores[key] = scored
+        scores.move_to_end(key)
+        while len(scores) > CANDIDATE_CACHE_ENTRIES:
+            scores.popitem(last=False)
+    return scored
+
+
+@app.get("/candidates")
+def get_candidates(
+    resolution: int = Query(8, ge=6, le=11),
+    distance: int = Query(500, gt=0),
+    limit: int = Query(50, ge=1, le=CANDIDATES_MAX_LIMIT),
+    min_score: float = Query(0.0, ge=0, le=1),
+):
+    """
+    Ranks every H3 cell of a resolution as an airport candidate.
+
+    Args:
+        resolution: The H3 resolution to score.
+        distance: Maximum distance from a point to consider, in miles.
+        limit: Maximum number of candidates to return.
+        min_score: Candidates scoring lower are left out.
+
+    Returns
+        dict:
+            - "resolution": The H3 resolution of the cells.
+            - "candidates": The best candidates first, each with the cell ID, its
+              "lat"/"lng" centroid, observation "count", "score" and score components.
+    """
+    refresh_dataset()
+
+    candidates = rank_candidates(
+        get_candidate_scores(resolution, distance), limit, min_score
+    )
+    return {
+        "resolution": resolution,
+        "candidates": candidates.to_dict(orient="records"),
+    }
 
 
 @app.post("/map")
@@ -86,10 +594,30 @@ async def handle_request(request: Request):
         dict:
             A dictionary containing the requested data or an error message.
 
+            - "Distance" requests may also carry a "Viewport" ([min_lon, min_lat,
+              max_lon, max_lat]) and a "Zoom". Only hexagons that may intersect
+              the viewport are returned, "Resolution" (default 11) is capped to
+              the finest resolution legible at that zoom, and at most
+              MAP_MAX_FEATURES hexagons, the busiest, are returned. The
+              resolution used is in the X-H3-Resolution header. "Significance"
+              defaults to 1. "Distance" is in miles and need not be whole.
+
+            - If "Distance" is present and the request accepts
+              "application/vnd.apache.arrow.stream":
+                - An Arrow IPC stream with one row per H3 cell: the cell ID as an
+                  integer, its count and one column per ADS-B category.
+
+            - If "Distance" is present and the request accepts
+              "application/vnd.adsb-map-ids+json":
+                - "columns": One array per column, the cell IDs as hex strings,
+                  "count" and one per ADS-B category. No geometry is sent; it
+                  follows from the cell IDs.
+
             - If "Distance" is present in the request data:
                 - "h3_df": JSON string containing H3 grid data.
                 - "h3_gdf": JSON string containing GeoPandas DataFrame data.
                 - "geojson_obj_h3_gdf": GeoJSON object of the H3 grid data.
+                Coordinates are rounded to MAP_COORDINATE_DECIMALS decimals.
             - If "x_adjust" is present in the request data:
                 - "bcords_str": String containing the bounding box coordinates.
                 - "nw_rs_str": (Optional) String containing the new image shape
@@ -98,6 +626,11 @@ async def handle_request(request: Request):
                     - "evalscript_true_color": String containing the evaluation script.
                     - "tampa_bbox": SentinelHub BBox object.
                     - "tampa_size": Tuple representing the image dimensions.
+            - Map responses carry an ETag header. If the request's If-None-Match
+              matches it, an empty 304 response is returned instead.
+            - If too many maps are already being rendered, a 503 response with a
+              Retry-After header; if the map takes longer than MAP_TIMEOUT
+              seconds to render, a 504 response.
             - If an error occurs:
                 - "Error during map making": String describing the error.
                 - "data": The original user data.
@@ -113,21 +646,75 @@ async def handle_request(request: Request):
 
             params = data.get("data")
 
-            DISTANCE = params["Distance"]
-            RESOLUTION = params["Resolution"]
-            SIGNIFICANCE = params["Resolution"]
-            #
-            h3_df, h3_gdf, geojson_obj_h3_gdf = make_dfs(
-                DISTANCE, RESOLUTION, SIGNIFICANCE, Geom_DF=gdf
-            )
-            h3_df = h3_df.to_json(orient="records")
-            h3_gdf = h3_gdf.to_json()
-
-            return {
-                "h3_df": h3_df,
-                "h3_gdf": h3_gdf,
-                "geojson_obj_h3_gdf": geojson_obj_h3_gdf,
-            }
+            # Whole miles are looked up in the H3 cube, other radii are a
+            # prefix of the distance-sorted points
+            DISTANCE = float(params["Distance"])
+            if not np.isfinite(DISTANCE):
+                raise ValueError("Distance must be a finite number of miles")
+            RESOLUTION = int(params.get("Resolution", MAP_RESOLUTIONS[-1]))
+            SIGNIFICANCE = int(params.get("Significance", 1))
+
+            viewport = params.get("Viewport")
+            if viewport is not None:
+                # Rounded so views a few metres apart share a cache entry
+                viewport = tuple(round(float(value), 4) for value in viewport)
+                if len(viewport) != 4:
+                    raise ValueError("Viewport must be [min_lon, min_lat, max_lon, max_lat]")
+            if params.get("Zoom") is not None:
+                lat = (viewport[1] + viewport[3]) / 2 if viewport is not None else 0.0
+                RESOLUTION = min(
+                    RESOLUTION, max_resolution_for_zoom(float(params["Zoom"]), lat)
+                )
+            RESOLUTION = min(max(RESOLUTION, MAP_RESOLUTIONS[0]), MAP_RESOLUTIONS[-1])
+
+            accept = request.headers.get("accept", "")
+            if ARROW_MEDIA_TYPE in accept:
+                media_type = ARROW_MEDIA_TYPE
+            elif MAP_IDS_MEDIA_TYPE in accept:
+                media_type = MAP_IDS_MEDIA_TYPE
+            else:
+                media_type = "application/json"
+
+            # Reloading maps the new file and rebuilds indexes, keep it off the event loop
+            await run_in_threadpool(refresh_dataset)
+            version = dataset_version
+            key = (version, DISTANCE, RESOLUTION, SIGNIFICANCE, media_type, viewport)
+            cached = map_cache.get(key)
+            if cached is None:
+                future = map_pool.submit(
+                    version, DISTANCE, RESOLUTION, SIGNIFICANCE, media_type, viewport
+                )
+                if future is None:
+                    return Response(
+                        content="Too many maps are being rendered, try again shortly.",
+                        status_code=503,
+                        headers={"Retry-After": str(MAP_RETRY_AFTER)},
+                    )
+                try:
+                    # Shielded so a timeout does not cancel the render itself
+                    body = await asyncio.wait_for(
+                        asyncio.shield(asyncio.wrap_future(future)), MAP_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+
+                    def cache_late_render(done):
+                        # The next request for this map becomes a cache hit
+                        if not done.cancelled() and done.exception() is None:
+                            map_cache.put(key, done.result(), media_type)
+
+                    future.add_done_callback(cache_late_render)
+                    return Response(
+                        content="The map took too long to render.",
+                        status_code=504,
+                        headers={"Retry-After": str(MAP_RETRY_AFTER)},
+                    )
+                cached = map_cache.put(key, body, media_type)
+            etag, body, media_type = cached
+
+            headers = {"ETag": etag, "X-H3-Resolution": str(RESOLUTION)}
+            if etag_matches(request.headers.get("if-none-match"), etag):
+                return Response(status_code=304, headers=headers)
+            return Response(content=body, media_type=media_type, headers=headers)
 
         elif "x_adjust" in data.get("data"):
             box_params = data.get("data")
@@ -142,6 +729,7 @@ async def handle_request(request: Request):
 
             box_coords_string = f"Box coordinates: {tampa_box_cords}"
 
+            new_res_string = None
             if max(tampa_size) != 2500:
                 new_res = max(tampa_size) / 2500
                 tampa_bbox = BBox(bbox=tampa_box_cords, crs=CRS.WGS84)
@@ -168,8 +756,6 @@ async def handle_request(request: Request):
                     return [sample.B04, sample.B03, sample.B02];
                 }
             """
-            print(type(tampa_bbox))
-            print(type(tampa_size))
             for_st = {
                 "evalscript_true_color": evalscript_true_color,
                 "tampa_bbox": tampa_bbox,
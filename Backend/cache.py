@@ -0,0 +1,136 @@
+"""
+Memory-bounded response cache for the FastAPI backend.
+
+Rendered responses are kept in an LRU ordered dict under a byte budget,
+together with an ETag so clients can revalidate with If-None-Match and
+get a 304 instead of the full body.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+def file_version(path):
+    """
+    Identifies the current contents of a file by its modification time and size.
+
+    Args:
+        path: Path to the file.
+
+    Returns:
+        A tuple of (mtime in nanoseconds, size in bytes), or None if the file is missing.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def make_etag(body):
+    """
+    Computes a strong ETag for a response body.
+
+    Args:
+        body: The response body as bytes.
+
+    Returns:
+        The quoted ETag string.
+    """
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Checks an If-None-Match header against an ETag.
+
+    The header is a comma separated list of entity tags, or "*". Tags are
+    compared exactly, ignoring a weak "W/" prefix as If-None-Match requires.
+
+    Args:
+        if_none_match: The If-None-Match header value, or None.
+        etag: The quoted ETag of the current response.
+
+    Returns:
+        True if the client's copy is current.
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache of rendered responses, bounded by total body size.
+
+    Args:
+        max_bytes: Total size of cached bodies, in bytes, before the least
+            recently used entries are evicted.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Looks up a cached response and marks it as recently used.
+
+        Args:
+            key: The normalized request key.
+
+        Returns:
+            A tuple of (etag, body, media_type), or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, body, media_type):
+        """
+        Stores a rendered response, evicting old entries to stay within budget.
+
+        Bodies larger than the whole budget are not cached.
+
+        Args:
+            key: The normalized request key.
+            body: The response body as bytes.
+            media_type: The response media type.
+
+        Returns:
+            A tuple of (etag, body, media_type) for the stored response.
+        """
+        entry = (make_etag(body), body, media_type)
+        if len(body) > self.max_bytes:
+            return entry
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[1])
+            self._entries[key] = entry
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted[1])
+        return entry
+
+    def clear(self):
+        """Drops every cached response."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
@@ -0,0 +1,168 @@
+"""
+Airport candidates: every H3 cell of one resolution scored in a single vectorized pass.
+
+Aircraft near an airfield are on the ground or low, slow, seen often, and of
+several kinds. Surface vehicles (ADS-B categories C1 and C2) only move on
+airport grounds. For each cell the score combines:
+
+- low_altitude: fraction of observations at or below LOW_ALTITUDE_FT ("ground" is 0 ft);
+- slow: fraction of observations at or below LOW_SPEED_KT ground speed;
+- density: log of the cell's observation count relative to the busiest cell;
+- category_mix: normalized entropy of the ADS-B categories observed;
+- surface_vehicles: surface vehicle observations, saturating at SURFACE_VEHICLE_SATURATION;
+
+weighted by SCORE_WEIGHTS into a score in [0, 1]. Everything is a bincount over
+factorized cell codes, so the whole dataset is scored in seconds.
+
+The backend serves the ranking at GET /candidates. Running this script writes it
+to a CSV file as a batch job:
+
+    python candidates.py 8 airport_candidates_res8.csv
+"""
+
+import os
+import sys
+
+import h3
+import numpy as np
+import pandas as pd
+
+from dataset import h3_to_str, open_dataset
+from utils import ADSB_CATEGORIES
+
+LOW_ALTITUDE_FT = 1500
+LOW_SPEED_KT = 60
+MIN_OBSERVATIONS = 10
+SURFACE_VEHICLE_CATEGORIES = ("C1", "C2")
+SURFACE_VEHICLE_SATURATION = 3
+SCORE_WEIGHTS = {
+    "low_altitude": 0.35,
+    "slow": 0.25,
+    "density": 0.2,
+    "category_mix": 0.1,
+    "surface_vehicles": 0.1,
+}
+
+
+def altitude_feet(alt_baro):
+    """
+    Converts barometric altitudes to numbers, with "ground" as 0 feet.
+
+    The column has few distinct values, so they are parsed once each.
+
+    Args:
+        alt_baro: The alt_baro column, numbers or strings.
+
+    Returns:
+        A float NumPy array, NaN where the altitude is unknown.
+    """
+    codes, values = pd.factorize(alt_baro)
+    numeric = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce")
+    numeric = numeric.to_numpy(dtype=float, copy=True)
+    numeric[np.asarray(values, dtype=object) == "ground"] = 0
+    return np.where(codes >= 0, numeric[codes], np.nan)
+
+
+def score_cells(dataset, resolution, max_distance=None, min_observations=MIN_OBSERVATIONS):
+    """
+    Scores every H3 cell of one resolution as an airport candidate.
+
+    Args:
+        dataset: A ColumnarDataset with alt_baro, gs, category, distance and
+            `H3_{resolution}_cell` columns.
+        resolution: The H3 resolution to score.
+        max_distance: Only observations within this distance (in the dataset's
+            distance unit) are used, or None for all of them.
+        min_observations: Cells seen fewer times are left out.
+
+    Returns:
+        A DataFrame with the integer cell ID, its count, each score component
+        and the score, highest score first.
+    """
+    hex_id_field = f"H3_{resolution}_cell"
+    cells = dataset[hex_id_field]
+    # Rows without a position have no cell. They are dropped before the IDs
+    # leave the nullable column, as floats would round the 64-bit IDs.
+    has_cell = cells.notna().to_numpy()
+    if max_distance is not None:
+        distance = dataset["distance"].to_numpy(dtype=float, na_value=np.nan)
+        has_cell = has_cell & (distance <= max_distance)
+
+    cells = cells[has_cell].to_numpy(dtype=np.uint64)
+    altitude = altitude_feet(dataset["alt_baro"].to_numpy())[has_cell]
+    speed = dataset["gs"].to_numpy(dtype=float, na_value=np.nan)[has_cell]
+    category_codes = pd.Categorical(
+        dataset["category"], categories=ADSB_CATEGORIES
+    ).codes[has_cell]
+
+    cell_codes, cell_ids = pd.factorize(cells, sort=True)
+    n_cells = len(cell_ids)
+
+    count = np.bincount(cell_codes, minlength=n_cells)
+    low = np.bincount(cell_codes, weights=altitude <= LOW_ALTITUDE_FT, minlength=n_cells)
+    slow = np.bincount(cell_codes, weights=speed <= LOW_SPEED_KT, minlength=n_cells)
+
+    n_categories = len(ADSB_CATEGORIES)
+    has_category = category_codes >= 0
+    categories = np.bincount(
+        cell_codes[has_category] * n_categories + category_codes[has_category],
+        minlength=n_cells * n_categories,
+    ).reshape(n_cells, n_categories)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = categories / categories.sum(axis=1, keepdims=True)
+        entropy = np.nansum(np.where(share > 0, -share * np.log(share), 0), axis=1)
+    surface = categories[
+        :, [ADSB_CATEGORIES.index(c) for c in SURFACE_VEHICLE_CATEGORIES]
+    ].sum(axis=1)
+
+    components = pd.DataFrame(
+        {
+            hex_id_field: cell_ids,
+            "count": count,
+            "low_altitude": low / np.maximum(count, 1),
+            "slow": slow / np.maximum(count, 1),
+            "density": np.log1p(count) / np.log1p(max(count.max(initial=0), 1)),
+            "category_mix": entropy / np.log(n_categories),
+            "surface_vehicles": np.minimum(surface / SURFACE_VEHICLE_SATURATION, 1),
+        }
+    )
+    components["score"] = sum(
+        weight * components[name] for name, weight in SCORE_WEIGHTS.items()
+    )
+    components = components[components["count"] >= min_observations]
+    return components.sort_values("score", ascending=False, kind="stable").reset_index(
+        drop=True
+    )
+
+
+def rank_candidates(scores, limit, min_score=0.0):
+    """
+    Picks the best airport candidates and adds the centroid of each cell.
+
+    Args:
+        scores: A DataFrame from `score_cells`.
+        limit: Maximum number of candidates.
+        min_score: Candidates scoring lower are left out.
+
+    Returns:
+        A DataFrame of at most `limit` candidates with hex string cell IDs and
+        "lat" and "lng" columns, best first.
+    """
+    candidates = scores[scores["score"] >= min_score].head(limit).copy()
+    hex_id_field = candidates.columns[0]
+    candidates[hex_id_field] = h3_to_str(candidates[hex_id_field])
+    centroids = [h3.cell_to_latlng(cell) for cell in candidates[hex_id_field]]
+    candidates["lat"] = [lat for lat, _ in centroids]
+    candidates["lng"] = [lng for _, lng in centroids]
+    return candidates
+
+
+if __name__ == "__main__":
+    resolution = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    path = sys.argv[2] if len(sys.argv) > 2 else f"airport_candidates_res{resolution}.csv"
+
+    adsb_dataset = open_dataset(os.environ.get("ADSB_DATASET", "adsb_data.arrow"))
+    ranked = score_cells(adsb_dataset, resolution)
+    rank_candidates(ranked, len(ranked)).to_csv(path, index=False)
+    print(f"Wrote {len(ranked)} airport candidates at resolution {resolution} to {path}.")
@@ -0,0 +1,126 @@
+"""
+Pool of read-only SQLite connections shared by the backend's request threads.
+
+Opening a connection per request pays for the open, the schema parse and a cold
+page cache every time. The pool keeps up to `size` connections open, hands the
+most recently used one out first so its cache stays warm, and lets sqlite3 keep
+each connection's prepared statements between requests.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_PATH = os.environ.get("ADSB_DB", "adsb_data.db")
+
+# FastAPI runs sync endpoints in anyio's threadpool, which has 40 threads by default
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 40))
+
+PRAGMAS = (
+    "PRAGMA query_only = ON",
+    "PRAGMA mmap_size = 268435456",  # 256 MiB
+    "PRAGMA cache_size = -65536",  # 64 MiB
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of read-only SQLite connections, opened on demand.
+
+    Args:
+        path: Path to the SQLite database.
+        size: Maximum number of open connections.
+        timeout: Seconds to wait for a free connection before raising queue.Empty.
+    """
+
+    def __init__(self, path, size, timeout=30):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._columns = {}
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            f"file:{self.path}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+            cached_statements=256,
+        )
+        conn.row_factory = sqlite3.Row  # To get rows as dictionaries
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self):
+        """
+        Takes a connection out of the pool, opening a new one if none is idle
+        and the pool is not full.
+
+        Returns:
+            An open sqlite3.Connection.
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+        return self._idle.get(timeout=self.timeout)
+
+    def release(self, conn):
+        """
+        Returns a connection to the pool.
+
+        Args:
+            conn: A connection obtained from `acquire`.
+        """
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put_nowait(conn)
+
+    @contextmanager
+    def connection(self):
+        """Context manager that acquires a connection and releases it afterwards."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def table_columns(self, conn, table):
+        """
+        Returns the column names of a table, cached until the schema changes.
+
+        Args:
+            conn: A connection obtained from `acquire`.
+            table: The table name.
+
+        Returns:
+            A list of column names.
+        """
+        schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        key = (table, schema_version)
+        if key not in self._columns:
+            self._columns[key] = [
+                row["name"] for row in conn.execute(f"PRAGMA table_info('{table}')")
+            ]
+        return self._columns[key]
+
+
+db_pool = ConnectionPool(DB_PATH, DB_POOL_SIZE)
@@ -0,0 +1,135 @@
+"""
+In-memory indexes over the ADS-B dataset, built once when the dataset is loaded.
+
+- FlightIndex keeps the row numbers sorted by (flight, timestamp) with the offset
+  of each flight, so a flight's track over a time range is two binary searches
+  and a slice instead of a scan of the whole dataset.
+- CellIndex is an inverted index from the H3 cells of one resolution to the
+  contiguous range of (sorted) row numbers observed in each cell. Cells are kept
+  as sorted 64-bit integers.
+"""
+
+import numpy as np
+import pandas as pd
+
+from dataset import h3_str_to_int
+
+
+def to_utc_nanoseconds(value):
+    """
+    Converts a date or timestamp string to UTC nanoseconds since the epoch.
+
+    Args:
+        value: Anything `pd.Timestamp` accepts. Naive values are taken to be UTC.
+
+    Returns:
+        The timestamp as an integer number of nanoseconds.
+    """
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize("UTC")
+    return timestamp.as_unit("ns").value
+
+
+class FlightIndex:
+    """
+    Row numbers of the dataset sorted by (flight, timestamp).
+
+    Args:
+        dataset: A ColumnarDataset with `flight` and `timestamp` columns.
+    """
+
+    def __init__(self, dataset):
+        flight_codes, self.flights = pd.factorize(dataset["flight"], sort=True)
+        timestamps = pd.DatetimeIndex(dataset["timestamp"]).as_unit("ns").asi8
+
+        order = np.lexsort((timestamps, flight_codes))
+        order = order[flight_codes[order] >= 0]  # rows without a flight come first
+
+        self.order = order
+        self.timestamps = timestamps[order]
+        self.offsets = np.searchsorted(
+            flight_codes[order], np.arange(len(self.flights) + 1)
+        )
+        self.flights = np.asarray(self.flights, dtype=object)
+
+        flight_types = dataset.frame(["flight", "type"])
+        self.type_counts = flight_types.groupby(["flight", "type"]).size()
+
+    def rows(self, flight, start=None, end=None):
+        """
+        Looks up the rows of one flight, in time order.
+
+        Args:
+            flight: The flight ID.
+            start: Optional first timestamp (inclusive), in UTC nanoseconds.
+            end: Optional last timestamp (exclusive), in UTC nanoseconds.
+
+        Returns:
+            A NumPy array of row numbers into the dataset.
+        """
+        position = np.searchsorted(self.flights, flight)
+        if position == len(self.flights) or self.flights[position] != flight:
+            return self.order[:0]
+
+        lo, hi = self.offsets[position], self.offsets[position + 1]
+        flight_timestamps = self.timestamps[lo:hi]
+        if end is not None:
+            hi = lo + np.searchsorted(flight_timestamps, end, side="left")
+        if start is not None:
+            lo = lo + np.searchsorted(flight_timestamps, start, side="left")
+        return self.order[lo:hi]
+
+    def observations(self, flights):
+        """
+        Counts all the observations of some flights, per flight and aircraft type.
+
+        Args:
+            flights: The flight IDs.
+
+        Returns:
+            A DataFrame with "flight", "type" and "count" columns, most observed first.
+        """
+        counts = self.type_counts[self.type_counts.index.isin(flights, level="flight")]
+        return counts.reset_index(name="count").sort_values(by="count", ascending=False)
+
+
+class CellIndex:
+    """
+    Row numbers of the dataset grouped by H3 cell at one resolution.
+
+    Args:
+        dataset: A ColumnarDataset with an `H3_{resolution}_cell` column.
+        resolution: The H3 resolution to index.
+    """
+
+    def __init__(self, dataset, resolution):
+        cell_codes, cells = pd.factorize(dataset[f"H3_{resolution}_cell"], sort=True)
+
+        order = np.argsort(cell_codes, kind="stable")
+        order = order[cell_codes[order] >= 0]
+
+        self.order = order
+        self.offsets = np.searchsorted(cell_codes[order], np.arange(len(cells) + 1))
+        self.cells = np.asarray(cells, dtype=np.uint64)
+
+    def rows(self, cells):
+        """
+        Looks up the rows observed in any of the given cells.
+
+        Args:
+            cells: The H3 cell IDs as hex strings. Cells that were never observed
+                are ignored.
+
+        Returns:
+            A NumPy array of row numbers into the dataset.
+        """
+        cells = np.unique(h3_str_to_int(cells))
+        positions = np.searchsorted(self.cells, cells)
+        in_range = positions < len(self.cells)
+        positions, cells = positions[in_range], cells[in_range]
+        positions = positions[self.cells[positions] == cells]
+        return np.concatenate(
+            [self.order[self.offsets[p] : self.offsets[p + 1]] for p in positions]
+            + [self.order[:0]]
+        )
@@ -0,0 +1,27 @@
+"""Tests of the /map response cache helpers."""
+
+import pytest
+
+from cache import etag_matches
+
+ETAG = '"16281b8ae6eccb9a9d40a2817cbbab86"'
+
+
+@pytest.mark.parametrize(
+    ("if_none_match", "matches"),
+    [
+        (None, False),
+        ("", False),
+        (ETAG, True),
+        ("*", True),
+        (f'"other", {ETAG}', True),
+        (f"W/{ETAG}", True),
+        (f'"{ETAG[1:-1]}0"', False),
+        (f'"{ETAG[1:-2]}"', False),
+        (ETAG[1:-1], False),
+        ('"a", "b"', False),
+    ],
+)
+def test_etag_matches(if_none_match, matches):
+    """Only an exact tag, a weak tag or "*" in the list matches."""
+    assert etag_matches(if_none_match, ETAG) is matches
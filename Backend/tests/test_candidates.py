@@ -0,0 +1,102 @@
+"""Tests of the airport-candidate scorer on a small Arrow dataset."""
+
+import h3
+import numpy as np
+import pandas as pd
+import pytest
+
+from candidates import rank_candidates, score_cells
+from dataset import h3_to_str, open_dataset, write_dataset
+from utils import ADSB_CATEGORIES
+
+AIRPORT = (27.9755, -82.5332)
+FARMLAND = (28.3, -82.1)
+
+
+@pytest.fixture(name="dataset")
+def dataset_fixture(tmp_path):
+    """A dataset with a busy low and slow cell, a quiet cell and rows without a position."""
+    rows = []
+    for i in range(40):
+        rows.append((AIRPORT, "ground" if i % 2 else 500, 10.0, "A3" if i % 3 else "C1"))
+    for _ in range(20):
+        rows.append((FARMLAND, 30000, 450.0, "A3"))
+    for _ in range(50):
+        rows.append((None, 1000, 100.0, "A1"))
+
+    cells = [
+        pd.NA if point is None else h3.str_to_int(h3.latlng_to_cell(*point, 11))
+        for point, *_ in rows
+    ]
+    df = pd.DataFrame(
+        {
+            "h3_cell": pd.array(cells, dtype="UInt64"),
+            "alt_baro": [alt for _, alt, _, _ in rows],
+            "gs": [gs for _, _, gs, _ in rows],
+            "category": [category for *_, category in rows],
+            "distance": np.linspace(0, 2, len(rows)),
+        }
+    )
+    path = tmp_path / "adsb_data.arrow"
+    write_dataset(df, str(path))
+    return open_dataset(str(path))
+
+
+def test_score_cells_skips_rows_without_a_cell(dataset):
+    """Null cells are left out instead of turning every cell ID into a float."""
+    scores = score_cells(dataset, 6)
+
+    assert scores["H3_6_cell"].dtype == np.uint64
+    assert scores["count"].sum() == 60
+    airport = h3.str_to_int(h3.latlng_to_cell(*AIRPORT, 6))
+    assert scores["H3_6_cell"].iloc[0] == airport
+
+
+def test_score_cells_max_distance(dataset):
+    """Only observations within max_distance are counted."""
+    scores = score_cells(dataset, 8, max_distance=0.5)
+
+    assert scores["count"].tolist() == [28]
+
+
+def test_rank_candidates_with_null_cells(dataset):
+    """Candidates of a dataset with null cells get hex IDs and centroids."""
+    candidates = rank_candidates(score_cells(dataset, 6), limit=5)
+
+    assert candidates["H3_6_cell"].iloc[0] == h3.latlng_to_cell(*AIRPORT, 6)
+    lat, lng = candidates[["lat", "lng"]].iloc[0]
+    assert abs(lat - AIRPORT[0]) < 0.2 and abs(lng - AIRPORT[1]) < 0.2
+
+
+def test_h3_to_str_rejects_floats():
+    """Float cells have lost precision, so they are an error rather than passed on."""
+    with pytest.raises(TypeError):
+        h3_to_str(pd.Series([6.2e17, np.nan]))
+
+
+def test_score_components(dataset):
+    """Each component is computed per cell from its own observations."""
+    scores = score_cells(dataset, 8).set_index("H3_8_cell")
+    airport = scores.loc[h3.str_to_int(h3.latlng_to_cell(*AIRPORT, 8))]
+    farmland = scores.loc[h3.str_to_int(h3.latlng_to_cell(*FARMLAND, 8))]
+
+    surface, other = 14, 26  # every third airport row is a surface vehicle
+    share = np.array([surface, other]) / (surface + other)
+    assert airport["count"] == 40
+    assert (airport[["low_altitude", "slow", "density", "surface_vehicles"]] == 1).all()
+    assert airport["category_mix"] == pytest.approx(
+        -(share * np.log(share)).sum() / np.log(len(ADSB_CATEGORIES))
+    )
+    assert farmland[["low_altitude", "slow", "category_mix"]].tolist() == [0, 0, 0]
+    assert farmland["score"] == pytest.approx(0.2 * np.log1p(20) / np.log1p(40))
+
+
+def test_thresholds_leave_out_quiet_and_low_scoring_cells(dataset):
+    """min_observations drops rarely seen cells and min_score weak candidates."""
+    airport = h3.latlng_to_cell(*AIRPORT, 8)
+
+    busy = score_cells(dataset, 8, min_observations=25)
+    candidates = rank_candidates(score_cells(dataset, 8), limit=10, min_score=0.5)
+
+    assert busy["H3_8_cell"].tolist() == [h3.str_to_int(airport)]
+    assert candidates["H3_8_cell"].tolist() == [airport]
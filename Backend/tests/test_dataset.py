@@ -0,0 +1,102 @@
+"""Tests of the integer H3 helpers against the h3 library, and of opening datasets."""
+
+import os
+
+import h3
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from dataset import (
+    H3_COLUMN,
+    H3_RESOLUTION,
+    h3_descendant_range,
+    h3_parents,
+    open_dataset,
+)
+
+
+@pytest.fixture(name="cells", scope="module")
+def cells_fixture():
+    """Finest cells spread over the globe, pentagons included."""
+    rng = np.random.default_rng(0)
+    lats = np.degrees(np.arcsin(rng.uniform(-1, 1, 500)))
+    lngs = rng.uniform(-180, 180, 500)
+    points = [
+        h3.latlng_to_cell(lat, lng, H3_RESOLUTION) for lat, lng in zip(lats, lngs)
+    ]
+    pentagons = [
+        h3.cell_to_center_child(pentagon, H3_RESOLUTION)
+        for pentagon in h3.get_pentagons(0)
+    ]
+    return [h3.str_to_int(cell) for cell in points + pentagons]
+
+
+@pytest.mark.parametrize("resolution", range(H3_RESOLUTION + 1))
+def test_h3_parents_match_h3(cells, resolution):
+    """Parents from the index bits are the parents h3 computes."""
+    parents = h3_parents(np.array(cells, dtype=np.uint64), resolution)
+
+    expected = [
+        h3.str_to_int(h3.cell_to_parent(h3.int_to_str(cell), resolution))
+        for cell in cells
+    ]
+    assert parents.tolist() == expected
+
+
+def test_h3_parents_keep_missing_cells():
+    """0, which stands for no cell, has no parent."""
+    assert h3_parents(np.array([0], dtype=np.uint64), 6).tolist() == [0]
+
+
+@pytest.mark.parametrize(
+    ("resolution", "child_resolution"), [(0, 2), (5, 7), (6, 11), (9, 11), (11, 11)]
+)
+def test_h3_descendant_range_bounds_children(cells, resolution, child_resolution):
+    """Every child of a cell lies in its descendant range."""
+    for cell in cells[::25]:
+        parent = h3.cell_to_parent(h3.int_to_str(cell), resolution)
+        lowest, highest = h3_descendant_range(h3.str_to_int(parent), child_resolution)
+
+        children = h3.cell_to_children(parent, child_resolution)
+        assert lowest <= min(h3.str_to_int(child) for child in children)
+        assert max(h3.str_to_int(child) for child in children) <= highest
+
+
+def test_h3_descendant_range_excludes_siblings(cells):
+    """Descendants of the sibling cells lie outside the range."""
+    cell = h3.int_to_str(cells[0])
+    parent = h3.cell_to_parent(cell, 7)
+    lowest, highest = h3_descendant_range(h3.str_to_int(parent))
+
+    for sibling in h3.cell_to_children(h3.cell_to_parent(parent, 6), 7):
+        if sibling == parent:
+            continue
+        for child in h3.cell_to_children(sibling, 9):
+            descendant = h3.str_to_int(h3.cell_to_center_child(child, H3_RESOLUTION))
+            assert not lowest <= descendant <= highest
+
+
+def test_open_dataset_leaves_legacy_files_to_the_owner(tmp_path):
+    """Readers refuse the legacy layout without rewriting it, the owner converts it."""
+    path = str(tmp_path / "adsb_data.arrow")
+    cell = h3.latlng_to_cell(27.9, -82.5, H3_RESOLUTION)
+    column = f"H3_{H3_RESOLUTION}_cell"
+    legacy = pd.DataFrame({column: [cell, None], "distance": [0.1, 0.2]})
+    legacy = pa.Table.from_pandas(legacy, preserve_index=False)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, legacy.schema) as writer:
+        writer.write_table(legacy)
+    written = os.stat(path).st_mtime_ns
+
+    with pytest.raises(ValueError):
+        open_dataset(path)
+    assert os.stat(path).st_mtime_ns == written
+
+    dataset = open_dataset(path, convert=True)
+    assert H3_COLUMN in dataset.table.column_names
+    assert dataset["H3_8_cell"].tolist() == [
+        h3.str_to_int(h3.cell_to_parent(cell, 8)),
+        pd.NA,
+    ]
+    assert H3_COLUMN in open_dataset(path).table.column_names
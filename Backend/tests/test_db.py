@@ -0,0 +1,75 @@
+"""Tests of the read-only SQLite connection pool on a small database."""
+
+import queue
+import sqlite3
+import threading
+
+import pytest
+
+from db import ConnectionPool
+
+
+@pytest.fixture(name="db_path")
+def db_path_fixture(tmp_path):
+    """A database with a small gdf_expanded table."""
+    path = str(tmp_path / "adsb_data.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE gdf_expanded (flight TEXT, timestamp TEXT)")
+        conn.executemany(
+            "INSERT INTO gdf_expanded VALUES (?, ?)",
+            [("N123", "2024-11-05 00:00:00+00:00"), ("N456", "2024-11-05 00:00:10+00:00")],
+        )
+    conn.close()
+    return path
+
+
+def test_connections_are_read_only(db_path):
+    """Pooled connections can query the database but not change it."""
+    pool = ConnectionPool(db_path, size=2)
+
+    with pool.connection() as conn:
+        rows = conn.execute("SELECT flight FROM gdf_expanded ORDER BY flight").fetchall()
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM gdf_expanded")
+
+    assert [row["flight"] for row in rows] == ["N123", "N456"]
+
+
+def test_idle_connections_are_reused(db_path):
+    """A released connection is handed out again instead of opening another."""
+    pool = ConnectionPool(db_path, size=2)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert second is first
+
+
+def test_full_pool_waits_for_a_release(db_path):
+    """Past `size` connections, acquire waits for one to come back or times out."""
+    pool = ConnectionPool(db_path, size=1, timeout=0.1)
+    conn = pool.acquire()
+
+    with pytest.raises(queue.Empty):
+        pool.acquire()
+
+    threading.Timer(0.05, pool.release, (conn,)).start()
+    pool.timeout = 5
+    assert pool.acquire() is conn
+
+
+def test_table_columns_follow_the_schema(db_path):
+    """Column names are cached per schema version, so a migration is seen."""
+    pool = ConnectionPool(db_path, size=1)
+    with pool.connection() as conn:
+        assert pool.table_columns(conn, "gdf_expanded") == ["flight", "timestamp"]
+
+    with sqlite3.connect(db_path) as writer:
+        writer.execute("ALTER TABLE gdf_expanded ADD COLUMN type TEXT")
+    writer.close()
+
+    with pool.connection() as conn:
+        columns = pool.table_columns(conn, "gdf_expanded")
+    assert columns == ["flight", "timestamp", "type"]
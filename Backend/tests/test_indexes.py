@@ -0,0 +1,114 @@
+"""Tests of the flight and cell indexes against filtering the dataset."""
+
+import h3
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataset import h3_to_str, open_dataset, write_dataset
+from indexes import CellIndex, FlightIndex, to_utc_nanoseconds
+
+FLIGHTS = ["AAL12", "DAL3", "N123AB", None]
+TYPES = {"AAL12": "B738", "DAL3": "A321", "N123AB": "C172", None: None}
+
+
+@pytest.fixture(name="frame", scope="module")
+def frame_fixture():
+    """Shuffled observations of a few flights around Tampa, some without a flight or cell."""
+    rng = np.random.default_rng(0)
+    n = 400
+    flights = rng.choice(np.array(FLIGHTS, dtype=object), n)
+    points = zip(rng.normal(27.9, 0.05, n), rng.normal(-82.5, 0.05, n))
+    return pd.DataFrame(
+        {
+            "flight": flights,
+            "type": [TYPES[flight] for flight in flights],
+            "timestamp": pd.Timestamp("2024-11-05", tz="UTC")
+            + pd.to_timedelta(rng.integers(0, 86_400, n), unit="s"),
+            "h3_cell": pd.array(
+                [
+                    h3.str_to_int(h3.latlng_to_cell(lat, lng, 11)) if i % 10 else pd.NA
+                    for i, (lat, lng) in enumerate(points)
+                ],
+                dtype="UInt64",
+            ),
+            "distance": rng.random(n),
+        }
+    )
+
+
+@pytest.fixture(name="dataset", scope="module")
+def dataset_fixture(frame, tmp_path_factory):
+    """The observations as a ColumnarDataset."""
+    path = str(tmp_path_factory.mktemp("indexes") / "adsb_data.arrow")
+    write_dataset(frame, path)
+    return open_dataset(path)
+
+
+@pytest.mark.parametrize("flight", FLIGHTS[:3])
+def test_flight_rows_are_the_flight_in_time_order(dataset, flight):
+    """A flight's rows are exactly its observations, sorted by time."""
+    index = FlightIndex(dataset)
+
+    track = dataset.take(index.rows(flight), ["flight", "timestamp"])
+
+    assert (track["flight"] == flight).all()
+    assert len(track) == (dataset["flight"] == flight).sum()
+    assert track["timestamp"].is_monotonic_increasing
+
+
+def test_flight_rows_in_a_time_range(dataset):
+    """The time range includes its start and excludes its end."""
+    index = FlightIndex(dataset)
+    timestamps = dataset.take(index.rows("DAL3"), ["timestamp"])["timestamp"]
+    start, end = timestamps.iloc[10], timestamps.iloc[20]
+
+    rows = index.rows("DAL3", to_utc_nanoseconds(start), to_utc_nanoseconds(end))
+
+    window = dataset.take(rows, ["timestamp"])["timestamp"]
+    expected = timestamps[(timestamps >= start) & (timestamps < end)]
+    assert window.tolist() == expected.tolist()
+
+
+def test_unknown_flight_has_no_rows(dataset):
+    """Flights that were never observed give an empty result instead of an error."""
+    assert len(FlightIndex(dataset).rows("UAL999")) == 0
+
+
+def test_observations_per_flight_and_type(frame, dataset):
+    """Observations are counted per flight and type, most observed first."""
+    counts = FlightIndex(dataset).observations(["AAL12", "N123AB"])
+
+    expected = frame[frame["flight"].isin(["AAL12", "N123AB"])].value_counts(
+        ["flight", "type"]
+    )
+    assert counts.set_index(["flight", "type"])["count"].to_dict() == expected.to_dict()
+    assert counts["count"].is_monotonic_decreasing
+
+
+def test_to_utc_nanoseconds_reads_naive_values_as_utc():
+    """Naive and UTC values of the same instant agree, other zones are converted."""
+    assert to_utc_nanoseconds("2024-11-05") == to_utc_nanoseconds("2024-11-05T00:00Z")
+    assert to_utc_nanoseconds("2024-11-04T20:00-04:00") == to_utc_nanoseconds("2024-11-05")
+
+
+@pytest.mark.parametrize("resolution", [6, 8, 10])
+def test_cell_rows_are_the_rows_in_the_cells(dataset, resolution):
+    """The rows of some cells are exactly the rows observed in them, never null ones."""
+    column = f"H3_{resolution}_cell"
+    cells = h3_to_str(dataset[column].dropna().drop_duplicates())
+    queried = list(cells[::2]) + ["8844c0b1a1fffff"]  # and one never observed
+
+    rows = CellIndex(dataset, resolution).rows(queried)
+
+    expected = np.flatnonzero(pd.Series(h3_to_str(dataset[column])).isin(queried))
+    assert len(expected) > 0
+    np.testing.assert_array_equal(np.sort(rows), expected)
+
+
+def test_unobserved_cells_have_no_rows(dataset):
+    """Cells outside the data, above and below every indexed cell, match nothing."""
+    index = CellIndex(dataset, 8)
+
+    assert len(index.rows(["8001fffffffffff", "8ff2830828052d5"])) == 0
+    assert len(index.rows([])) == 0
@@ -0,0 +1,81 @@
+"""Tests of the map aggregation against filtering and grouping the points."""
+
+import h3
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import ADSB_CATEGORIES, DistanceCube, select_h3, sort_by_distance
+
+HEX_ID_FIELD = "H3_8_cell"
+
+
+@pytest.fixture(name="points", scope="module")
+def points_fixture():
+    """Points around Tampa with distances in degrees, as on the map."""
+    rng = np.random.default_rng(0)
+    n = 5000
+    lats = rng.normal(27.9, 0.3, n)
+    lngs = rng.normal(-82.5, 0.3, n)
+    categories = rng.choice(ADSB_CATEGORIES + [None], n)
+    return pd.DataFrame(
+        {
+            HEX_ID_FIELD: [
+                h3.str_to_int(h3.latlng_to_cell(lat, lng, 8))
+                for lat, lng in zip(lats, lngs)
+            ],
+            "category": categories,
+            # Whole-mile distances included, where the rounding is decided
+            "distance": np.where(
+                rng.random(n) < 0.2,
+                rng.integers(0, 40, n) / 69,
+                rng.uniform(0, 40 / 69, n),
+            ),
+        }
+    )
+
+
+def brute_force(points, distance):
+    """The counts within `distance` miles, by filtering and grouping the points."""
+    within = points[points["distance"] <= distance / 69]
+    counts = within.groupby(HEX_ID_FIELD).size().rename("count")
+    categories = pd.crosstab(within[HEX_ID_FIELD], within["category"]).reindex(
+        columns=ADSB_CATEGORIES, fill_value=0
+    )
+    expected = pd.concat([counts, categories], axis=1).fillna(0).astype(np.int64)
+    return expected.rename_axis(HEX_ID_FIELD).reset_index()
+
+
+@pytest.mark.parametrize("distance", [0, 1, 7, 20, 39, 40, 500])
+def test_distance_cube_matches_brute_force(points, distance):
+    """Whole-mile lookups in the cube equal the counts of the points within."""
+    h3_df = DistanceCube(points, HEX_ID_FIELD).at(distance)
+
+    expected = brute_force(points, distance)
+    result = h3_df.sort_values(HEX_ID_FIELD).reset_index(drop=True)
+    pd.testing.assert_frame_equal(
+        result.astype(np.int64), expected.astype(np.int64), check_dtype=False
+    )
+
+
+def test_distance_cube_before_any_point(points):
+    """No cell has points within a negative distance."""
+    assert DistanceCube(points, HEX_ID_FIELD).at(-1).empty
+
+
+@pytest.mark.parametrize("distance", [0.5, 7.25, 39.9])
+def test_select_h3_fractional_distance(points, distance):
+    """Radii the cube cannot answer are a prefix of the distance-sorted points."""
+    h3_df = select_h3(
+        distance,
+        8,
+        1,
+        sort_by_distance(points),
+        h3_cube={8: DistanceCube(points, HEX_ID_FIELD)},
+    )
+
+    expected = brute_force(points, distance)
+    result = h3_df.sort_values(HEX_ID_FIELD).reset_index(drop=True)
+    pd.testing.assert_frame_equal(
+        result.astype(np.int64), expected.astype(np.int64), check_dtype=False
+    )
@@ -3,17 +3,25 @@ Utils imports
 """
 
 from __future__ import annotations
+import io
 import json
+import math
 from typing import Any
-from collections import Counter
+from functools import lru_cache
 
-from geojson import Feature, FeatureCollection
 import h3
+from h3.api import basic_int as h3_int
+import shapely
 from shapely.geometry import Polygon
 import matplotlib.pyplot as plt
 import numpy as np
+import pandas as pd
+import pyarrow as pa
 import geopandas as gpd
 import streamlit as st
+from PIL import Image
+
+from dataset import h3_to_str
 
 
 def plot_image(
@@ -41,33 +49,122 @@ def plot_image(
     ax.set_yticks([])
 
 
-def st_plot_image(
+def image_to_uint8(
     image: np.ndarray,
     factor: float = 1.0,
     clip_range: tuple[float, float] | None = None,
-    **kwargs: Any,
-) -> None:
+) -> np.ndarray:
     """
-    Plots an RGB image in a Streamlit app using Matplotlib.
+    Scales and clips an RGB image and converts it to 8-bit pixels.
+
+    Like `plt.imshow`, a scaled image is taken to be in [0, 1].
 
     Args:
-        image: The image data as a NumPy array.
+        image: The image as a NumPy array.
         factor: A scaling factor to apply to the image.
         clip_range: A tuple of (min, max) values to clip the image intensities.
-        **kwargs: Additional keyword arguments to pass to `plt.imshow`.
+
+    Returns:
+        The image as a uint8 NumPy array.
     """
+    if factor == 1 and clip_range is None and np.issubdtype(image.dtype, np.integer):
+        return image.astype(np.uint8, copy=False)
+
+    scaled = image.astype(np.float32) * np.float32(factor)
     if clip_range is not None:
-        image = np.clip(image * factor, *clip_range)
-    else:
-        image = image * factor
+        np.clip(scaled, *clip_range, out=scaled)
+    np.clip(scaled, 0, 1, out=scaled)
+    scaled *= 255
+    scaled += 0.5
+    return scaled.astype(np.uint8)
 
-    # Create a Matplotlib figure
-    fig, ax = plt.subplots(figsize=(10, 10))  # Adjust figure size as needed
-    ax.imshow(image, **kwargs)
-    ax.axis("off")  # Turn off axis labels and ticks
 
-    # Display the Matplotlib figure in Streamlit
-    st.pyplot(fig)
+def encode_image(
+    image: np.ndarray,
+    factor: float = 1.0,
+    clip_range: tuple[float, float] | None = None,
+    image_format: str = "JPEG",
+    quality: int = 90,
+) -> bytes:
+    """
+    Encodes an RGB image to JPEG or PNG bytes in memory.
+
+    Args:
+        image: The image as a NumPy array.
+        factor: A scaling factor to apply to the image.
+        clip_range: A tuple of (min, max) values to clip the image intensities.
+        image_format: "JPEG" or "PNG".
+        quality: JPEG quality, from 1 to 95.
+
+    Returns:
+        The encoded image.
+    """
+    buffer = io.BytesIO()
+    Image.fromarray(image_to_uint8(image, factor, clip_range)).save(
+        buffer, format=image_format, quality=quality
+    )
+    return buffer.getvalue()
+
+
+def st_plot_image(
+    image: np.ndarray,
+    factor: float = 1.0,
+    clip_range: tuple[float, float] | None = None,
+    image_format: str = "JPEG",
+    **kwargs: Any,
+) -> bytes:
+    """Utility function for showing RGB images in a Streamlit app.
+
+    The image is encoded once in memory, so the same bytes can be sent to the
+    browser and, base64 encoded, to a vision model.
+
+    Args:
+        image: The image to show as a NumPy array.
+        factor: A scaling factor to apply to the image.
+        clip_range: A tuple specifying the minimum and maximum values to clip the image to.
+        image_format: "JPEG" or "PNG".
+        **kwargs: Additional keyword arguments to pass to `st.image`.
+
+    Returns:
+        The encoded image.
+    """
+    data = encode_image(
+        image, factor=factor, clip_range=clip_range, image_format=image_format
+    )
+    st.image(data, **kwargs)
+    return data
+
+
+def hexagons_to_geojson(hex_ids, values, decimals=None):
+    """
+    Builds a GeoJSON FeatureCollection of hexagons from column arrays.
+
+    Args:
+        hex_ids: Sequence of H3 cell IDs, one per feature.
+        values: Sequence of values to associate with each hexagon.
+        decimals: Optional number of decimals to round the coordinates to.
+
+    Returns:
+        A GeoJSON FeatureCollection dict.
+    """
+    hex_ids = hex_ids.tolist() if hasattr(hex_ids, "tolist") else list(hex_ids)
+    values = values.tolist() if hasattr(values, "tolist") else list(values)
+
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "id": hex_id,
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [cell_boundary(hex_id, decimals)],
+                },
+                "properties": {"value": value},
+            }
+            for hex_id, value in zip(hex_ids, values)
+        ],
+    }
 
 
 def hexagons_dataframe_to_geojson(
@@ -79,7 +176,7 @@ def hexagons_dataframe_to_geojson(
     Args:
         df_hex: The GeoDataFrame containing hexagon data.
         hex_id_field: The name of the column in `df_hex` containing hexagon IDs.
-        geometry_field: The name of the column in `df_hex` containing the geometry.
+        geometry_field: Unused; hexagon geometry is derived from the hexagon IDs.
         value_field: The name of the column in `df_hex` containing the value to be associated
             with each hexagon.
         file_output: Optional file path to save the GeoJSON to.
@@ -87,18 +184,7 @@ def hexagons_dataframe_to_geojson(
     Returns:
         A GeoJSON FeatureCollection object.
     """
-
-    list_features = []
-
-    for i, row in df_hex.iterrows():
-        feature = Feature(
-            geometry=row[geometry_field],
-            id=row[hex_id_field],
-            properties={"value": row[value_field]},
-        )
-        list_features.append(feature)
-
-    feat_collection = FeatureCollection(list_features)
+    feat_collection = hexagons_to_geojson(df_hex[hex_id_field], df_hex[value_field])
 
     if file_output is not None:
         with open(file_output, "w") as f:
@@ -108,6 +194,30 @@ def hexagons_dataframe_to_geojson(
         return feat_collection
 
 
+# About 1 KB per boundary, so roughly 50 MB per process when full
+H3_BOUNDARY_CACHE_SIZE = 50_000
+
+
+@lru_cache(maxsize=H3_BOUNDARY_CACHE_SIZE)
+def cell_boundary(cell, decimals=None):
+    """
+    Returns the closed (lon, lat) boundary ring of an H3 cell.
+
+    Boundaries are cached process-wide, so hot cells are only computed once.
+
+    Args:
+        cell: The H3 cell ID.
+        decimals: Optional number of decimals to round the coordinates to.
+
+    Returns:
+        A tuple of (lon, lat) coordinate pairs, with the first pair repeated at the end.
+    """
+    ring = tuple((lng, lat) for lat, lng in h3.cell_to_boundary(cell))
+    if decimals is not None:
+        ring = tuple((round(lng, decimals), round(lat, decimals)) for lng, lat in ring)
+    return ring + ring[:1]
+
+
 def cell_to_shapely(cell):
     """
     Converts an H3 cell ID to a Shapely Polygon.
@@ -118,9 +228,26 @@ def cell_to_shapely(cell):
     Returns:
         A Shapely Polygon object representing the hexagon.
     """
-    coords = h3.cell_to_boundary(cell)
-    flipped = tuple(coord[::-1] for coord in coords)
-    return Polygon(flipped)
+    return Polygon(cell_boundary(cell))
+
+
+def cells_to_shapely(hex_ids, decimals=None):
+    """
+    Converts a sequence of H3 cell IDs to Shapely Polygons in one vectorized call.
+
+    Args:
+        hex_ids: Sequence of H3 cell IDs.
+        decimals: Optional number of decimals to round the coordinates to.
+
+    Returns:
+        A NumPy array of Shapely Polygon objects, one per cell.
+    """
+    rings = [cell_boundary(hex_id, decimals) for hex_id in hex_ids]
+    if not rings:
+        return np.empty(0, dtype=object)
+    coords = np.concatenate(rings)
+    ring_index = np.repeat(np.arange(len(rings)), [len(ring) for ring in rings])
+    return shapely.polygons(shapely.linearrings(coords, indices=ring_index))
 
 
 def center_to_bbox(center_lat, center_lon, x_adjust, y_adjust):
@@ -168,20 +295,358 @@ def cellToBbox(cell_id, x_adjust, y_adjust):
     return center_to_bbox(center[1], center[0], x_adjust, y_adjust)
 
 
-def count_categories(categories):
+ADSB_CATEGORIES = [f"{group}{number}" for group in "ABC" for number in range(8)]
+
+
+def count_categories(Geom_DF, hex_id_field):
     """
-    Counts the occurrences of each category in a list.
+    Counts points and ADS-B categories per H3 cell in a single vectorized pass.
 
     Args:
-        categories: A list of categories.
+        Geom_DF: GeoDataFrame containing a `category` column and the hex id column.
+        hex_id_field: The name of the column in `Geom_DF` containing hexagon IDs,
+            as integers or strings.
 
     Returns:
-        A Counter object containing category counts.
+        A DataFrame with one row per H3 cell (IDs as in `Geom_DF`), its point
+        count, and one integer column per ADS-B category in `ADSB_CATEGORIES`.
     """
-    return Counter(categories)
+    cell_codes, cells = pd.factorize(Geom_DF[hex_id_field], sort=True)
+    category_codes = pd.Categorical(
+        Geom_DF["category"], categories=ADSB_CATEGORIES
+    ).codes
+
+    has_cell = cell_codes >= 0
+    has_category = has_cell & (category_codes >= 0)
+    n_categories = len(ADSB_CATEGORIES)
+
+    category_counts = np.bincount(
+        cell_codes[has_category] * n_categories + category_codes[has_category],
+        minlength=len(cells) * n_categories,
+    ).reshape(len(cells), n_categories)
 
+    h3_df = pd.DataFrame(category_counts, columns=ADSB_CATEGORIES)
+    h3_df.insert(0, "count", np.bincount(cell_codes[has_cell], minlength=len(cells)))
+    h3_df.insert(0, hex_id_field, cells)
+    return h3_df
 
-def make_dfs(DISTANCE, RESOLUTION, SIGNIFICANCE, Geom_DF):
+
+MAP_RESOLUTIONS = (6, 7, 8, 9, 10, 11)
+
+
+def aggregate_h3(RESOLUTION, Geom_DF):
+    """
+    Aggregates points into per-cell counts at one H3 resolution.
+
+    Args:
+        RESOLUTION: H3 resolution for hexagons.
+        Geom_DF: GeoDataFrame containing spatial data, already filtered on distance.
+
+    Returns:
+        A DataFrame with one row per H3 cell, its point count and one column
+        per ADS-B category.
+    """
+    return count_categories(Geom_DF, f"H3_{RESOLUTION}_cell")
+
+
+def sort_by_distance(Geom_DF):
+    """
+    Sorts points by distance, so every radius selects a prefix of the rows.
+
+    Points without a distance are dropped, as no radius includes them.
+
+    Args:
+        Geom_DF: GeoDataFrame containing a `distance` column.
+
+    Returns:
+        A copy of `Geom_DF` sorted by distance, with a fresh RangeIndex.
+    """
+    Geom_DF = Geom_DF[Geom_DF["distance"].notna()]
+    return Geom_DF.sort_values("distance", kind="stable", ignore_index=True)
+
+
+def distance_prefix(Geom_DF, DISTANCE):
+    """
+    Selects the points within a distance.
+
+    On a frame from `sort_by_distance` this is a binary search and a slice
+    of the leading rows, without a mask over the whole frame.
+
+    Args:
+        Geom_DF: GeoDataFrame containing a `distance` column.
+        DISTANCE: Maximum distance from a point, in miles.
+
+    Returns:
+        The rows with `distance <= DISTANCE / 69`.
+    """
+    distance = Geom_DF["distance"]
+    if not distance.is_monotonic_increasing:
+        return Geom_DF[distance <= DISTANCE / 69]
+    end = np.searchsorted(distance.to_numpy(), DISTANCE / 69, side="right")
+    return Geom_DF.iloc[:end]
+
+
+def distance_miles(distance):
+    """
+    Finds the smallest whole-mile radius that includes each point.
+
+    Args:
+        distance: Distances in degrees (miles / 69), as a NumPy array.
+
+    Returns:
+        An int64 array `miles` such that `distance <= D / 69` exactly when
+        `miles <= D`, for every whole number of miles D.
+    """
+    miles = np.maximum(np.ceil(distance * 69), 0)
+    # Settle float rounding with the same comparison the radius filter makes
+    miles[distance > miles / 69] += 1
+    miles[(miles > 0) & (distance <= (miles - 1) / 69)] -= 1
+    return miles.astype(np.int64)
+
+
+MAP_MIN_HEX_PIXELS = 4
+# Metres per pixel at zoom 0 on the equator, for the 512 px tiles of Mapbox GL
+MAPBOX_METERS_PER_PIXEL = 78271.517
+
+
+def max_resolution_for_zoom(zoom, lat=0.0, resolutions=MAP_RESOLUTIONS):
+    """
+    Picks the finest H3 resolution still legible at a map zoom level.
+
+    Args:
+        zoom: The Mapbox zoom level.
+        lat: Latitude of the view, which sets the map scale.
+        resolutions: The resolutions to choose from.
+
+    Returns:
+        The finest resolution whose hexagons are at least MAP_MIN_HEX_PIXELS
+        wide, or the coarsest one if none is.
+    """
+    meters_per_pixel = MAPBOX_METERS_PER_PIXEL * math.cos(math.radians(lat)) / 2**zoom
+    legible = [
+        resolution
+        for resolution in resolutions
+        if 2 * h3.average_hexagon_edge_length(resolution, unit="m")
+        >= MAP_MIN_HEX_PIXELS * meters_per_pixel
+    ]
+    return max(legible, default=min(resolutions))
+
+
+def cell_centroids(hex_ids):
+    """
+    Computes the centroids of H3 cells.
+
+    Args:
+        hex_ids: The cells, as integers or strings.
+
+    Returns:
+        A tuple of (lat, lng) float NumPy arrays.
+    """
+    if not pd.api.types.is_integer_dtype(getattr(hex_ids, "dtype", None)):
+        hex_ids = [h3.str_to_int(hex_id) for hex_id in hex_ids]
+    centroids = np.array(
+        [h3_int.cell_to_latlng(hex_id) for hex_id in np.asarray(hex_ids).tolist()],
+        dtype=float,
+    ).reshape(-1, 2)
+    return centroids[:, 0], centroids[:, 1]
+
+
+def in_viewport(lat, lng, viewport, RESOLUTION):
+    """
+    Finds the cells that may intersect a map view.
+
+    A cell is kept when its centroid is inside the view grown by one average
+    edge length, the distance from a centroid to the corners of its hexagon.
+
+    Args:
+        lat: Centroid latitudes of the cells.
+        lng: Centroid longitudes of the cells.
+        viewport: (min_lon, min_lat, max_lon, max_lat) of the view.
+        RESOLUTION: H3 resolution of the cells.
+
+    Returns:
+        A boolean NumPy array.
+    """
+    min_lon, min_lat, max_lon, max_lat = viewport
+    pad_lat = h3.average_hexagon_edge_length(RESOLUTION, unit="km") / 111.32
+    widest = max(abs(min_lat), abs(max_lat)) + pad_lat
+    pad_lon = pad_lat / max(math.cos(math.radians(min(widest, 89.0))), 1e-6)
+    return (
+        (lat >= min_lat - pad_lat)
+        & (lat <= max_lat + pad_lat)
+        & (lng >= min_lon - pad_lon)
+        & (lng <= max_lon + pad_lon)
+    )
+
+
+class DistanceCube:
+    """
+    Per-cell point and category counts at one H3 resolution, cumulated along
+    the distance axis so the counts within any whole-mile radius are one lookup.
+
+    Points are bucketed by the smallest whole-mile radius that includes them
+    (`distance_miles`). For every cell, the counts of its buckets are summed in
+    increasing distance, so the counts within D miles are the last cumulative
+    row at or below D: one binary search per cell instead of a filter, a copy
+    and a group-by over the points.
+
+    Args:
+        Geom_DF: GeoDataFrame containing `distance`, `category` and the hex id column.
+        hex_id_field: The name of the column in `Geom_DF` containing hexagon IDs.
+    """
+
+    def __init__(self, Geom_DF, hex_id_field):
+        self.hex_id_field = hex_id_field
+
+        distance = Geom_DF["distance"].to_numpy(dtype=float, na_value=np.nan)
+        cell_codes, cells = pd.factorize(Geom_DF[hex_id_field], sort=True)
+        category_codes = pd.Categorical(
+            Geom_DF["category"], categories=ADSB_CATEGORIES
+        ).codes.astype(np.int64)
+
+        valid = (cell_codes >= 0) & ~np.isnan(distance)
+        miles = distance_miles(distance[valid])
+        cell_codes, category_codes = cell_codes[valid], category_codes[valid]
+        # Points without a category still count, in an extra last column
+        n_columns = len(ADSB_CATEGORIES) + 1
+        category_codes[category_codes < 0] = n_columns - 1
+
+        self.cells = np.asarray(cells)
+        self._centroids = None
+        self.n_miles = int(miles.max(initial=0)) + 1
+        keys = cell_codes * self.n_miles + miles
+        self.keys, bucket_codes = np.unique(keys, return_inverse=True)
+        counts = np.bincount(
+            bucket_codes * n_columns + category_codes,
+            minlength=len(self.keys) * n_columns,
+        ).reshape(len(self.keys), n_columns)
+
+        # Cumulative over all buckets, less everything before each bucket's cell
+        cumulative = np.cumsum(counts, axis=0)
+        bucket_cells = self.keys // self.n_miles
+        self.starts = np.searchsorted(bucket_cells, np.arange(len(cells)))
+        before = np.vstack([np.zeros((1, n_columns), dtype=cumulative.dtype), cumulative])
+        self.cumulative = (cumulative - before[self.starts][bucket_cells]).astype(np.uint32)
+
+    def centroids(self, hex_ids):
+        """
+        Looks up the centroids of some of the cube's cells.
+
+        The centroids of all the cells are computed on first use and kept.
+
+        Args:
+            hex_ids: Cells of this cube, as integers.
+
+        Returns:
+            A tuple of (lat, lng) NumPy arrays.
+        """
+        if self._centroids is None:
+            self._centroids = cell_centroids(self.cells)
+        positions = np.searchsorted(self.cells, hex_ids)
+        lat, lng = self._centroids
+        return lat[positions], lng[positions]
+
+    def at(self, DISTANCE):
+        """
+        Looks up the counts of every cell within a whole-mile distance.
+
+        Args:
+            DISTANCE: Maximum distance from a point, in whole miles.
+
+        Returns:
+            The same DataFrame as `aggregate_h3` over the points within DISTANCE.
+        """
+        mile = min(int(DISTANCE), self.n_miles - 1)
+        if mile < 0:
+            positions = np.full(len(self.cells), -1)
+        else:
+            queries = np.arange(len(self.cells), dtype=np.int64) * self.n_miles + mile
+            positions = np.searchsorted(self.keys, queries, side="right") - 1
+        seen = positions >= self.starts
+        counts = self.cumulative[positions[seen]].astype(np.int64)
+
+        h3_df = pd.DataFrame(counts[:, :-1], columns=ADSB_CATEGORIES)
+        h3_df.insert(0, "count", counts.sum(axis=1))
+        h3_df.insert(0, self.hex_id_field, self.cells[seen])
+        return h3_df
+
+
+def build_h3_cube(Geom_DF, resolutions=MAP_RESOLUTIONS):
+    """
+    Precomputes the cumulative H3 aggregates of every resolution the UI offers.
+
+    Args:
+        Geom_DF: GeoDataFrame containing spatial data.
+        resolutions: H3 resolutions to aggregate for.
+
+    Returns:
+        A dict mapping each resolution to its DistanceCube.
+    """
+    return {
+        resolution: DistanceCube(Geom_DF, f"H3_{resolution}_cell")
+        for resolution in resolutions
+    }
+
+
+def select_h3(
+    DISTANCE,
+    RESOLUTION,
+    SIGNIFICANCE,
+    Geom_DF,
+    h3_cube=None,
+    viewport=None,
+    max_features=None,
+):
+    """
+    Selects the aggregated H3 cells that pass the significance threshold.
+
+    Args:
+        DISTANCE: Maximum distance from a point to consider for aggregation.
+        RESOLUTION: H3 resolution for hexagons.
+        SIGNIFICANCE: Minimum count of points in a hexagon to be displayed.
+        Geom_DF: GeoDataFrame containing spatial data.
+        h3_cube: Optional output of `build_h3_cube`. When it holds the requested
+            resolution and DISTANCE is a whole number of miles, the aggregation
+            is looked up instead of recomputed.
+        viewport: Optional (min_lon, min_lat, max_lon, max_lat) of the map view;
+            only cells that may intersect it are kept.
+        max_features: Optional maximum number of cells. When more pass, the
+            ones with the highest counts are kept.
+
+    Returns:
+        The aggregated H3 cell data as a DataFrame, in cell order.
+    """
+    hex_id_field = f"H3_{RESOLUTION}_cell"
+    cube = h3_cube.get(RESOLUTION) if h3_cube is not None else None
+    if cube is not None and float(DISTANCE).is_integer():
+        h3_df = cube.at(DISTANCE)
+    else:
+        h3_df = aggregate_h3(RESOLUTION, distance_prefix(Geom_DF, DISTANCE))
+
+    h3_df = h3_df[h3_df["count"] >= SIGNIFICANCE]
+
+    if viewport is not None:
+        if cube is not None:
+            lat, lng = cube.centroids(h3_df[hex_id_field])
+        else:
+            lat, lng = cell_centroids(h3_df[hex_id_field])
+        h3_df = h3_df[in_viewport(lat, lng, viewport, RESOLUTION)]
+
+    if max_features is not None and len(h3_df) > max_features:
+        h3_df = h3_df.nlargest(max_features, "count", keep="first").sort_index()
+    return h3_df
+
+
+def make_dfs(
+    DISTANCE,
+    RESOLUTION,
+    SIGNIFICANCE,
+    Geom_DF,
+    h3_cube=None,
+    viewport=None,
+    max_features=None,
+    decimals=None,
+):
     """
     Creates a the datasets need to make a choropleth map of H3 hexagons based on
     given parameters and a GeoDataFrame.
@@ -191,6 +656,10 @@ def make_dfs(DISTANCE, RESOLUTION, SIGNIFICANCE, Geom_DF):
         RESOLUTION: H3 resolution for hexagons.
         SIGNIFICANCE: Minimum count of points in a hexagon to be displayed.
         Geom_DF: GeoDataFrame containing spatial data.
+        h3_cube: Optional output of `build_h3_cube`, see `select_h3`.
+        viewport: Optional map view to restrict the cells to, see `select_h3`.
+        max_features: Optional maximum number of cells, see `select_h3`.
+        decimals: Optional number of decimals to round the hexagon coordinates to.
 
     Returns:
         A tuple containing:
@@ -199,27 +668,82 @@ def make_dfs(DISTANCE, RESOLUTION, SIGNIFICANCE, Geom_DF):
             - geojson_obj_h3_gdf: GeoJSON FeatureCollection of H3 cells.
     """
 
-    Geom_DF = Geom_DF[Geom_DF["distance"] <= DISTANCE / 69]
+    h3_df = select_h3(
+        DISTANCE,
+        RESOLUTION,
+        SIGNIFICANCE,
+        Geom_DF,
+        h3_cube=h3_cube,
+        viewport=viewport,
+        max_features=max_features,
+    )
+
+    hex_id_field = f"H3_{RESOLUTION}_cell"
+    h3_df = h3_df.assign(**{hex_id_field: h3_to_str(h3_df[hex_id_field])})
+    hex_ids = h3_df[hex_id_field]
+    h3_geoms = cells_to_shapely(hex_ids, decimals)
+    h3_gdf = gpd.GeoDataFrame(data=h3_df, geometry=h3_geoms, crs=4326)
+
+    geojson_obj_h3_gdf = hexagons_to_geojson(hex_ids, h3_df["count"], decimals)
+
+    return (h3_df, h3_gdf, geojson_obj_h3_gdf)
+
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+MAP_IDS_MEDIA_TYPE = "application/vnd.adsb-map-ids+json"
+# 5 decimals is about a metre, well inside the smallest (resolution 11) hexagon
+MAP_COORDINATE_DECIMALS = 5
+
+
+def h3_df_to_arrow(h3_df, hex_id_field):
+    """
+    Serializes aggregated H3 cell data to an Arrow IPC stream.
+
+    Cell IDs are sent as unsigned 64-bit integers and the counts as unsigned
+    32-bit integers, so the payload is a handful of flat columns.
 
-    h3_df = (
-        Geom_DF.groupby(f"H3_{RESOLUTION}_cell")
-        .agg(
-            count=(f"H3_{RESOLUTION}_cell", "size"),
-            category_counts=("category", count_categories),
+    Args:
+        h3_df: Aggregated H3 cell data, as returned by `select_h3`.
+        hex_id_field: The name of the column in `h3_df` containing hexagon IDs,
+            as integers or strings.
+
+    Returns:
+        The Arrow IPC stream as bytes.
+    """
+    hex_ids = h3_df[hex_id_field]
+    if pd.api.types.is_integer_dtype(hex_ids):
+        hex_ids = hex_ids.to_numpy(dtype=np.uint64)
+    else:
+        hex_ids = np.fromiter(
+            (h3.str_to_int(hex_id) for hex_id in hex_ids), dtype=np.uint64, count=len(h3_df)
         )
-        .reset_index()
-    )
+    columns = {hex_id_field: hex_ids}
+    for column in h3_df.columns.drop(hex_id_field):
+        columns[column] = h3_df[column].to_numpy(dtype=np.uint32)
+    table = pa.table(columns)
 
-    h3_df = h3_df[h3_df["count"] >= SIGNIFICANCE]
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
 
-    h3_geoms = h3_df[f"H3_{RESOLUTION}_cell"].apply(lambda x: cell_to_shapely(x))
-    h3_gdf = gpd.GeoDataFrame(data=h3_df, geometry=h3_geoms, crs=4326)
 
-    geojson_obj_h3_gdf = hexagons_dataframe_to_geojson(
-        h3_gdf,
-        hex_id_field=f"H3_{RESOLUTION}_cell",
-        value_field="count",
-        geometry_field="geometry",
-    )
+def h3_df_to_ids_json(h3_df, hex_id_field):
+    """
+    Serializes aggregated H3 cell data to compact, geometry-free JSON.
+
+    Hexagon geometry follows from the cell ID, so only the IDs (as hex
+    strings) and the values are sent, one array per column. Clients rebuild
+    the polygons locally, e.g. with `hexagons_to_geojson`.
+
+    Args:
+        h3_df: Aggregated H3 cell data, as returned by `select_h3`.
+        hex_id_field: The name of the column in `h3_df` containing hexagon IDs.
 
-    return (h3_df, h3_gdf, geojson_obj_h3_gdf)
\ No newline at end of file
+    Returns:
+        The JSON document as bytes: {"columns": {column name: values}}.
+    """
+    columns = {hex_id_field: h3_to_str(h3_df[hex_id_field]).tolist()}
+    for column in h3_df.columns.drop(hex_id_field):
+        columns[column] = h3_df[column].astype(np.int64).tolist()
+    return json.dumps({"columns": columns}, separators=(",", ":")).encode()
@@ -0,0 +1,212 @@
+"""
+Process pool that renders /map responses away from the FastAPI event loop.
+
+Building a resolution 11 map holds the GIL for seconds, which used to stall every
+other request on the server. Map rendering now runs in a small pool of worker
+processes. Each worker memory-maps the Arrow dataset read-only, so the stored
+column pages are shared through the OS page cache. Workers reload the dataset
+when the parent tells them its version changed.
+
+What a worker derives from the file is private to it, not shared: the H3
+columns of every map resolution, a copy of the map columns sorted by distance
+(so a radius the cube cannot answer is a prefix slice of the rows), and the H3
+cube. That is about 66 bytes per point for the sorted columns, plus 100 bytes
+per occupied (cell, whole mile) pair and resolution for the cube, so memory
+grows linearly with MAP_WORKERS. Building them once per worker keeps renders
+lock-free and the workers independent; size MAP_WORKERS to the memory available
+rather than to the CPU count alone.
+
+The pool admits at most MAP_QUEUE_DEPTH renders (running or waiting) at a time.
+Callers are expected to answer 503 with a Retry-After header when `submit`
+returns None, and to stop waiting after MAP_TIMEOUT seconds.
+"""
+
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from dataset import open_dataset
+from utils import (
+    ARROW_MEDIA_TYPE,
+    MAP_COORDINATE_DECIMALS,
+    MAP_IDS_MEDIA_TYPE,
+    MAP_RESOLUTIONS,
+    build_h3_cube,
+    h3_df_to_arrow,
+    h3_df_to_ids_json,
+    make_dfs,
+    select_h3,
+    sort_by_distance,
+)
+
+MAP_WORKERS = int(os.environ.get("MAP_WORKERS", 2))
+MAP_QUEUE_DEPTH = int(os.environ.get("MAP_QUEUE_DEPTH", 8))
+MAP_TIMEOUT = float(os.environ.get("MAP_TIMEOUT", 60))
+MAP_RETRY_AFTER = int(os.environ.get("MAP_RETRY_AFTER", 5))
+# Most hexagons sent in one /map response; the busiest ones are kept
+MAP_MAX_FEATURES = int(os.environ.get("MAP_MAX_FEATURES", 20000))
+
+MAP_COLUMNS = ["distance", "category"] + [f"H3_{res}_cell" for res in MAP_RESOLUTIONS]
+
+# Per-process state of a worker, filled by `init_worker`
+_worker = {}
+
+
+def load_map_data(path):
+    """
+    Opens the dataset read-only and builds the H3 cube for every resolution the UI offers.
+
+    Args:
+        path: Path to the Arrow dataset, converted by the backend beforehand.
+
+    Returns:
+        A tuple of (map columns as a DataFrame sorted by distance, H3 cube).
+    """
+    # Only the columns /map needs are paged in from the memory-mapped file
+    gdf = open_dataset(path).frame(MAP_COLUMNS)
+    gdf = sort_by_distance(gdf)
+    return gdf, build_h3_cube(gdf)
+
+
+def init_worker(path, version):
+    """
+    Loads the map data once when a worker process starts.
+
+    Args:
+        path: Path to the Arrow dataset.
+        version: The dataset version (from `file_version`) being loaded.
+    """
+    _worker["path"] = path
+    _worker["version"] = version
+    _worker["gdf"], _worker["h3_cube"] = load_map_data(path)
+
+
+def render_map(version, DISTANCE, RESOLUTION, SIGNIFICANCE, media_type, viewport=None):
+    """
+    Renders the /map response body for one set of parameters, inside a worker.
+
+    At most MAP_MAX_FEATURES hexagons are rendered.
+
+    Args:
+        version: The dataset version the parent process is serving.
+        DISTANCE: Maximum distance from a point to consider for aggregation.
+        RESOLUTION: H3 resolution for hexagons.
+        SIGNIFICANCE: Minimum count of points in a hexagon to be displayed.
+        media_type: ARROW_MEDIA_TYPE, MAP_IDS_MEDIA_TYPE or "application/json".
+        viewport: Optional (min_lon, min_lat, max_lon, max_lat) of the map
+            view; only hexagons that may intersect it are rendered.
+
+    Returns:
+        The response body as bytes.
+    """
+    if _worker["version"] != version:
+        _worker["gdf"], _worker["h3_cube"] = load_map_data(_worker["path"])
+        _worker["version"] = version
+    gdf, h3_cube = _worker["gdf"], _worker["h3_cube"]
+
+    options = {"h3_cube": h3_cube, "viewport": viewport, "max_features": MAP_MAX_FEATURES}
+
+    if media_type == ARROW_MEDIA_TYPE:
+        h3_df = select_h3(DISTANCE, RESOLUTION, SIGNIFICANCE, Geom_DF=gdf, **options)
+        return h3_df_to_arrow(h3_df, f"H3_{RESOLUTION}_cell")
+    if media_type == MAP_IDS_MEDIA_TYPE:
+        h3_df = select_h3(DISTANCE, RESOLUTION, SIGNIFICANCE, Geom_DF=gdf, **options)
+        return h3_df_to_ids_json(h3_df, f"H3_{RESOLUTION}_cell")
+
+    h3_df, h3_gdf, geojson_obj_h3_gdf = make_dfs(
+        DISTANCE,
+        RESOLUTION,
+        SIGNIFICANCE,
+        Geom_DF=gdf,
+        decimals=MAP_COORDINATE_DECIMALS,
+        **options,
+    )
+    return json.dumps(
+        {
+            "h3_df": h3_df.to_json(orient="records"),
+            "h3_gdf": h3_gdf.to_json(),
+            "geojson_obj_h3_gdf": geojson_obj_h3_gdf,
+        }
+    ).encode()
+
+
+class MapRenderPool:
+    """
+    A bounded pool of map rendering processes.
+
+    Args:
+        path: Path to the Arrow dataset.
+        version: The dataset version at start up.
+        workers: Number of worker processes.
+        queue_depth: Maximum number of renders running or waiting at once.
+    """
+
+    def __init__(
+        self,
+        path,
+        version,
+        workers=MAP_WORKERS,
+        queue_depth=MAP_QUEUE_DEPTH,
+    ):
+        self.path = path
+        self.version = version
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(queue_depth)
+        self._lock = threading.Lock()
+        self._executor = self._start()
+
+    def _start(self):
+        # Spawned, not forked: the parent runs threads (the anyio threadpool)
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(self.path, self.version),
+        )
+
+    def submit(
+        self, version, DISTANCE, RESOLUTION, SIGNIFICANCE, media_type, viewport=None
+    ):
+        """
+        Queues a render unless the pool is saturated.
+
+        The slot is given back when the render finishes, not when the caller
+        stops waiting, so renders that time out still count against the limit.
+
+        Args:
+            version: The dataset version the parent process is serving.
+            DISTANCE: Maximum distance from a point to consider for aggregation.
+            RESOLUTION: H3 resolution for hexagons.
+            SIGNIFICANCE: Minimum count of points in a hexagon to be displayed.
+            media_type: ARROW_MEDIA_TYPE, MAP_IDS_MEDIA_TYPE or "application/json".
+            viewport: Optional (min_lon, min_lat, max_lon, max_lat) of the map view.
+
+        Returns:
+            A concurrent.futures.Future of the response body, or None if
+            queue_depth renders are already in flight.
+        """
+        if not self._slots.acquire(blocking=False):
+            return None
+        self.version = version
+        args = (version, DISTANCE, RESOLUTION, SIGNIFICANCE, media_type, viewport)
+        try:
+            with self._lock:
+                try:
+                    future = self._executor.submit(render_map, *args)
+                except BrokenProcessPool:
+                    # A worker died (e.g. killed for memory); start a fresh pool
+                    self._executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = self._start()
+                    future = self._executor.submit(render_map, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self):
+        """Stops the worker processes, cancelling renders that have not started."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
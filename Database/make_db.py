@@ -1,19 +1,287 @@
 """
 Converts the CSV data into a SQLite database.
 
-Reads the 'adsb_data_400m.csv' file into a Pandas DataFrame, then creates a SQLite database 
-named 'adsb_data.db'. The DataFrame is inserted into a table named '400m' within the database, 
-replacing any existing table with the same name.
+Reads 'geo_dataframe.csv' in chunks and bulk inserts it into the 'gdf_expanded' table of
+'adsb_data.db', using an explicit typed schema and one large transaction. Indexes are
+built on `flight`/`timestamp`, `timestamp` and `h3_cell` once the rows are loaded.
+
+The CSV's six `H3_*_cell` hex string columns are stored as one INTEGER column,
+`h3_cell`, holding the 64-bit index of the finest (resolution 11) cell. Coarser cells
+are derived from it by the readers, and the rows inside a coarser cell are one range
+of `h3_cell` values.
+
+The same chunks are written to 'adsb_data.arrow', an uncompressed Arrow IPC file that the
+backend and frontend memory-map instead of unpickling the dataset.
+
+The SHA-256 of the CSV is stored in the 'ingest_meta' table, and the rebuild is skipped
+when the CSV has not changed since the last run.
 """
 
+import hashlib
+import os
 import sqlite3
 import pandas as pd
+import pyarrow as pa
+
+CSV_PATH = "geo_dataframe.csv"
+# Both outputs live in the data directory mounted into every container
+DB_PATH = os.environ.get("ADSB_DB", "adsb_data.db")
+ARROW_PATH = os.environ.get("ADSB_DATASET", "adsb_data.arrow")
+TABLE = "gdf_expanded"
+CHUNK_SIZE = 100_000
+# Part of the stored checksum, so a change of the table layout forces a rebuild
+SCHEMA_VERSION = 2
+
+H3_COLUMN = "h3_cell"
+H3_SOURCE_COLUMN = "H3_11_cell"
+
+# alt_baro is NUMERIC so that numbers are stored as numbers and "ground" stays text
+COLUMN_TYPES = {
+    "alt_baro": "NUMERIC",
+    "gs": "REAL",
+    "track": "REAL",
+    "baro_rate": "REAL",
+    "lat": "REAL",
+    "lon": "REAL",
+    "distance": "REAL",
+    "category": "TEXT",
+    "t": "TEXT",
+    "type": "TEXT",
+    "flight": "TEXT",
+    "timestamp": "TEXT",
+    H3_COLUMN: "INTEGER",
+}
+
+
+def file_checksum(path):
+    """
+    Computes the SHA-256 checksum of a file.
+
+    Args:
+        path: Path to the file.
+
+    Returns:
+        The hex digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def with_h3_index(chunk):
+    """
+    Replaces the hex string H3 columns of a chunk with the integer `h3_cell` column.
+
+    Args:
+        chunk: A DataFrame read from the CSV.
+
+    Returns:
+        The chunk without `H3_*_cell` columns and with a nullable uint64 `h3_cell`.
+    """
+    cells = pd.array(
+        [int(cell, 16) if isinstance(cell, str) else None for cell in chunk[H3_SOURCE_COLUMN]],
+        dtype="UInt64",
+    )
+    h3_columns = [column for column in chunk.columns if column.startswith("H3_")]
+    return chunk.drop(columns=h3_columns).assign(**{H3_COLUMN: cells})
+
+
+def column_type(column, dtype):
+    """
+    Picks the SQLite type of a column, falling back to the pandas dtype for
+    columns not listed in COLUMN_TYPES.
+
+    Args:
+        column: The column name.
+        dtype: The pandas dtype of the column in the first chunk.
+
+    Returns:
+        The SQLite column type.
+    """
+    if column in COLUMN_TYPES:
+        return COLUMN_TYPES[column]
+    if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return "TEXT"
+
+
+def arrow_type(column, dtype):
+    """
+    Picks the Arrow type of a column in the memory-mapped dataset.
+
+    Args:
+        column: The column name.
+        dtype: The pandas dtype of the column in the first chunk.
+
+    Returns:
+        The pyarrow DataType.
+    """
+    if column == "timestamp":
+        return pa.timestamp("us", tz="UTC")
+    if column == H3_COLUMN:
+        return pa.uint64()
+    kind = column_type(column, dtype)
+    if kind == "INTEGER":
+        return pa.int64()
+    if kind == "REAL":
+        return pa.float64()
+    return pa.string()
+
+
+def stored_checksum(conn):
+    """
+    Reads the checksum of the CSV the database was last built from.
+
+    Args:
+        conn: An open SQLite connection.
+
+    Returns:
+        The stored checksum, or None if the database has not been built yet.
+    """
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS ingest_meta (source TEXT PRIMARY KEY, checksum TEXT)"
+    )
+    row = conn.execute(
+        "SELECT checksum FROM ingest_meta WHERE source = ?", (CSV_PATH,)
+    ).fetchone()
+    table = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (TABLE,)
+    ).fetchone()
+    return row[0] if row and table else None
+
+
+def arrow_readable(path):
+    """
+    Checks that a path holds a complete Arrow IPC file.
+
+    Args:
+        path: Path to the Arrow file.
+
+    Returns:
+        True if the file opens, False if it is missing, a directory or damaged.
+    """
+    if not os.path.isfile(path):
+        return False
+    try:
+        with pa.memory_map(path, "r") as source:
+            pa.ipc.open_file(source)
+    except (OSError, pa.ArrowInvalid):
+        return False
+    return True
+
+
+def ingest(conn, checksum):
+    """
+    Rebuilds the gdf_expanded table from the CSV inside one transaction, and
+    writes the Arrow dataset from the same chunks.
+
+    The checksum is only recorded once both the table and the Arrow file are in
+    place, so an interrupted run is redone on the next start.
+
+    Args:
+        conn: An open SQLite connection in autocommit mode.
+        checksum: The checksum of the CSV, stored once the load succeeds.
+    """
+    text_columns = [column for column, kind in COLUMN_TYPES.items() if kind == "TEXT"]
+    chunks = pd.read_csv(
+        CSV_PATH,
+        chunksize=CHUNK_SIZE,
+        dtype={column: str for column in text_columns + ["alt_baro", H3_SOURCE_COLUMN]},
+    )
+
+    arrow_tmp_path = f"{ARROW_PATH}.tmp"
+    arrow_sink = pa.OSFile(arrow_tmp_path, "wb")
+    arrow_writer = None
+
+    conn.execute("BEGIN")
+    try:
+        conn.execute("DELETE FROM ingest_meta WHERE source = ?", (CSV_PATH,))
+        conn.execute(f'DROP TABLE IF EXISTS "{TABLE}"')
+        insert_sql = None
+        for chunk in chunks:
+            chunk = with_h3_index(chunk)
+            if insert_sql is None:
+                arrow_schema = pa.schema(
+                    [
+                        (column, arrow_type(column, chunk[column].dtype))
+                        for column in chunk.columns
+                    ]
+                )
+                arrow_writer = pa.ipc.new_file(arrow_sink, arrow_schema)
+                schema = ", ".join(
+                    f'"{column}" {column_type(column, chunk[column].dtype)}'
+                    for column in chunk.columns
+                )
+                conn.execute(f'CREATE TABLE "{TABLE}" ({schema})')
+                columns = ", ".join(f'"{column}"' for column in chunk.columns)
+                placeholders = ", ".join("?" for _ in chunk.columns)
+                insert_sql = f'INSERT INTO "{TABLE}" ({columns}) VALUES ({placeholders})'
+
+            arrow_chunk = chunk.assign(
+                timestamp=pd.to_datetime(chunk["timestamp"], utc=True, format="ISO8601")
+            )
+            arrow_writer.write_table(
+                pa.Table.from_pandas(arrow_chunk, schema=arrow_schema, preserve_index=False)
+            )
+
+            chunk = chunk.astype(object).where(chunk.notna(), None)
+            conn.executemany(insert_sql, chunk.itertuples(index=False, name=None))
+
+        conn.execute(f'CREATE INDEX "idx_{TABLE}_flight" ON "{TABLE}" (flight, timestamp)')
+        conn.execute(f'CREATE INDEX "idx_{TABLE}_timestamp" ON "{TABLE}" (timestamp)')
+        conn.execute(f'CREATE INDEX "idx_{TABLE}_{H3_COLUMN}" ON "{TABLE}" ("{H3_COLUMN}")')
+
+        if arrow_writer is not None:
+            arrow_writer.close()
+        arrow_sink.close()
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        arrow_sink.close()
+        os.remove(arrow_tmp_path)
+        raise
+
+    # Replaced atomically (the tmp file is in the same directory), readers that
+    # have the old file mapped keep reading it
+    try:
+        os.replace(arrow_tmp_path, ARROW_PATH)
+    except OSError:
+        os.remove(arrow_tmp_path)
+        raise
+    conn.execute(
+        "INSERT OR REPLACE INTO ingest_meta (source, checksum) VALUES (?, ?)",
+        (CSV_PATH, checksum),
+    )
+
+
+def main():
+    checksum = f"{file_checksum(CSV_PATH)}:{SCHEMA_VERSION}"
+
+    for path in (DB_PATH, ARROW_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
 
-geo_dataframe_expanded = pd.read_csv("geo_dataframe.csv")
+    conn = sqlite3.connect(DB_PATH, isolation_level=None)
+    try:
+        if stored_checksum(conn) == checksum and arrow_readable(ARROW_PATH):
+            print(f"{CSV_PATH} is unchanged, skipping the rebuild of {DB_PATH}.")
+            return
 
-conn = sqlite3.connect("adsb_data.db")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA cache_size=-262144")  # 256 MiB
+        ingest(conn, checksum)
+        conn.execute("ANALYZE")
+        # The other containers open the database read-only and must not depend on
+        # this container's -wal/-shm files, so leave it self-contained.
+        conn.execute("PRAGMA journal_mode=DELETE")
+        print(f"Loaded {CSV_PATH} into {DB_PATH} and {ARROW_PATH}.")
+    finally:
+        conn.close()
 
-geo_dataframe_expanded.to_sql("gdf_expanded", conn, if_exists="replace", index=False)
 
-conn.commit()
-conn.close()
+if __name__ == "__main__":
+    main()
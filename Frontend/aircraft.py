@@ -0,0 +1,150 @@
+"""
+Local store of aircraft-type metadata parsed from Skybrary (https://skybrary.aero/).
+
+The name and description of each aircraft type are parsed once from the JSON-LD
+of its Skybrary page and kept on disk for AIRCRAFT_TTL seconds, so the "Plane
+Lookup" reads a local store instead of scraping the page on every rerun.
+
+Running this script prefetches every distinct aircraft type in the dataset:
+
+    python aircraft.py
+
+The Skybrary address can be pointed at a local stand-in with SKYBRARY_URL.
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from bs4 import BeautifulSoup as BS
+
+from store import DiskStore
+
+SKYBRARY_URL = os.environ.get("SKYBRARY_URL", "https://skybrary.aero/aircraft")
+AIRCRAFT_STORE_PATH = os.environ.get("AIRCRAFT_STORE", "aircraft_types.db")
+AIRCRAFT_TTL = 30 * 24 * 3600  # 30 days
+SKYBRARY_TIMEOUT = 10
+
+
+def open_aircraft_store(path=AIRCRAFT_STORE_PATH):
+    """
+    Opens the on-disk aircraft-type store.
+
+    Args:
+        path: Path to the store's SQLite file.
+
+    Returns:
+        A DiskStore whose entries expire after AIRCRAFT_TTL.
+    """
+    return DiskStore(path, ttl=AIRCRAFT_TTL)
+
+
+def parse_aircraft_page(html):
+    """
+    Extracts the aircraft name and description from a Skybrary page.
+
+    Args:
+        html: The page HTML.
+
+    Returns:
+        A dict with "name" and "description", or None if the page has no article.
+    """
+    soup = BS(html, "html.parser")
+    json_ld_script = soup.find("script", type="application/ld+json")
+    if not json_ld_script:
+        return None
+
+    data = json.loads(json_ld_script.string)
+    for item in data.get("@graph", []):
+        if item.get("@type") == "Article":
+            return {
+                "name": item.get("name", "No name found"),
+                "description": item.get("description", "No description found"),
+            }
+    return None
+
+
+def fetch_aircraft_type(plane, session=requests, timeout=SKYBRARY_TIMEOUT):
+    """
+    Downloads and parses the Skybrary page of one aircraft type.
+
+    Args:
+        plane: The aircraft type designator, e.g. "B38M".
+        session: A `requests` session (or the `requests` module) to fetch with.
+        timeout: Request timeout in seconds.
+
+    Returns:
+        A dict with "name" and "description", or None if Skybrary has no page.
+
+    Raises:
+        requests.exceptions.RequestException: If Skybrary cannot be reached.
+    """
+    response = session.get(f"{SKYBRARY_URL}/{str(plane).lower()}", timeout=timeout)
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return parse_aircraft_page(response.text)
+
+
+def lookup_aircraft_type(plane, store, session=requests):
+    """
+    Reads an aircraft type from the store, fetching and storing it on a miss.
+
+    Types that Skybrary does not know are stored too, so they are not fetched again.
+
+    Args:
+        plane: The aircraft type designator.
+        store: The DiskStore from `open_aircraft_store`.
+        session: A `requests` session (or the `requests` module) to fetch with.
+
+    Returns:
+        A dict with "name" and "description", or None if the type is unknown or
+        Skybrary cannot be reached.
+    """
+    key = str(plane).lower()
+    entry = store.get(key)
+    if entry is None:
+        try:
+            entry = {"info": fetch_aircraft_type(plane, session=session)}
+        except requests.exceptions.RequestException:
+            return None
+        store.put(key, entry)
+    return entry["info"]
+
+
+def prefetch_aircraft_types(planes, store, max_workers=8):
+    """
+    Fills the store for every aircraft type that is missing or expired.
+
+    Args:
+        planes: Aircraft type designators.
+        store: The DiskStore from `open_aircraft_store`.
+        max_workers: Number of pages fetched at the same time.
+
+    Returns:
+        The number of types that were fetched.
+    """
+    stored = store.fresh_keys()
+    missing = sorted({str(plane).lower() for plane in planes} - stored)
+
+    with requests.Session() as session, ThreadPoolExecutor(max_workers) as pool:
+
+        def fetch(plane):
+            try:
+                store.put(plane, {"info": fetch_aircraft_type(plane, session=session)})
+            except requests.exceptions.RequestException as e:
+                print(f"Could not fetch {plane}: {e}")
+
+        list(pool.map(fetch, missing))
+    return len(missing)
+
+
+if __name__ == "__main__":
+    from dataset import open_dataset
+    from utils import DATASET_PATH
+
+    adsb_dataset = open_dataset(DATASET_PATH)
+    types = adsb_dataset["type"].dropna().unique()
+    fetched = prefetch_aircraft_types(types, open_aircraft_store())
+    print(f"Fetched {fetched} of {len(types)} aircraft types into {AIRCRAFT_STORE_PATH}.")
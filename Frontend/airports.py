@@ -22,28 +22,77 @@ This script relies on several external libraries:
 """
 
 import os
-import json
 import datetime
-import base64
+from functools import partial
 import requests
 
 import streamlit as st
 import h3
-import geopandas as gpd
-from utils import st_plot_image
+from utils import (
+    encode_image,
+    fetch_map,
+    map_view_inputs,
+    st_plot_image,
+    viewport_bbox,
+)
 from streamlit_plotly_events import plotly_events
 import plotly.graph_objs as go
-import pandas as pd
 from sentinelhub import SHConfig
 from sentinelhub import (
     BBox,
     DataCollection,
-    MimeType,
-    SentinelHubRequest,
 )
 from openai import OpenAI
+from imagery import TileCache, fetch_true_color, fetch_true_color_batch
+from client import backend_client
+from vision import describe_image, describe_images, open_description_store
+from runways import runway_score, runway_verdict
+
+
+@st.cache_resource
+def tile_cache():
+    """Opens the satellite tile cache once per Streamlit process."""
+    return TileCache()
+
+
+@st.cache_resource
+def description_store():
+    """Opens the image description store once per Streamlit process."""
+    return open_description_store()
+
+
+@st.cache_resource
+def openai_client():
+    """Creates the OpenAI client once per Streamlit process."""
+    return OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+
+
+# Most cells the batch imagery mode fetches for one selection
+SATELLITE_BATCH_MAX = 12
+
 
+def satellite_box(result):
+    """
+    Reads the satellite box the backend computed for a cell.
 
+    Args:
+        result: The JSON of a /map response to an "x_adjust" request.
+
+    Returns:
+        A tuple of (sentinelhub BBox, (width, height) in pixels).
+    """
+    tampa_bbox_dict = result["tampa_bbox"]
+
+    tampa_box_coords = {
+        "min_x": tampa_bbox_dict["min_x"],
+        "max_x": tampa_bbox_dict["max_x"],
+        "min_y": tampa_bbox_dict["min_y"],
+        "max_y": tampa_bbox_dict["max_y"],
+    }
+
+    tampa_box_crs = tampa_bbox_dict["_crs"]
+
+    return BBox(tampa_box_coords, tampa_box_crs), result.get("tampa_size")
 
 
 def airports():
@@ -55,6 +104,8 @@ def airports():
 
     config.sh_client_id = CLIENT_ID
     config.sh_client_secret = CLIENT_SECRET
+    config.sh_base_url = os.environ.get("SH_BASE_URL", config.sh_base_url)
+    config.sh_token_url = os.environ.get("SH_TOKEN_URL", config.sh_token_url)
     config.save("my-profile")
 
 
@@ -68,35 +119,43 @@ def airports():
 
     SIGNIFICANCE = st.number_input("Significance", 0, 1000, value=1)
 
+    # Only the hexes in view are fetched, the backend lowers the resolution to
+    # what the zoom can show
+    center_lat, center_lon, zoom = map_view_inputs()
+
 
-    params = {"Distance": DISTANCE, "Resolution": RESOLUTION, "Significance": SIGNIFICANCE}
+    params = {
+        "Distance": DISTANCE,
+        "Resolution": RESOLUTION,
+        "Significance": SIGNIFICANCE,
+        "Viewport": viewport_bbox(center_lat, center_lon, zoom),
+        "Zoom": zoom,
+    }
 
-    temp_url = "http://127.0.0.1:8000/map"
-    actual_url = "http://airport_fastapi_route:5001/map"
+    client = backend_client()
 
 
     if SIGNIFICANCE >= 0:
         """Inputs parameters to fastapi backend,returns df's needed to make plot"""
-        response = requests.post(actual_url, json={"data": params}, timeout=10)
-
-        if response.status_code == 200:
-            try:
-                result = response.json()
-                geojson_obj_h3_gdf = result.get("geojson_obj_h3_gdf")
-                h3_df = pd.read_json(result.get("h3_df"))
-                h3_gdf = json.loads(result.get("h3_gdf"))
-                h3_gdf = gpd.GeoDataFrame.from_features(h3_gdf["features"])
-
-            except requests.exceptions.JSONDecodeError:
-                st.error("Error: The response is not in JSON format.")
-                st.write("Response content:", response.text)
+        try:
+            h3_df, geojson_obj_h3_gdf, resolution = fetch_map(client, params)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            st.error(f"Error: could not load the map data ({e}).")
+            st.stop()
+
+    if resolution != RESOLUTION:
+        st.caption(
+            f"Resolution {RESOLUTION} is too fine to draw at zoom {zoom}, showing "
+            f"resolution {resolution}. Zoom in for finer hexes."
+        )
+        RESOLUTION = resolution
 
     fig2 = go.Figure(
         data=[
             go.Choroplethmapbox(
                 geojson=geojson_obj_h3_gdf,
-                locations=h3_gdf[f"H3_{RESOLUTION}_cell"],
-                z=h3_gdf["count"],
+                locations=h3_df[f"H3_{RESOLUTION}_cell"],
+                z=h3_df["count"],
                 zmax=50,
                 zmin=0,
                 colorscale="inferno",
@@ -109,8 +168,8 @@ def airports():
         ],
         layout=go.Layout(
             mapbox_style="open-street-map",
-            mapbox_center={"lat": 27.842490, "lon": -82.503222},
-            mapbox_zoom=8,
+            mapbox_center={"lat": center_lat, "lon": center_lon},
+            mapbox_zoom=zoom,
             margin={"r": 0, "t": 0, "l": 0, "b": 0},
         ),
     )
@@ -161,7 +220,7 @@ def airports():
 
     if st.button("Show me the satellite image!"):
         try:
-            response = requests.post(actual_url, json={"data": box_params}, timeout=10)
+            response = client.post("/map", json={"data": box_params})
         except:
             st.write("Please select a cell to view")
 
@@ -170,78 +229,114 @@ def airports():
                 result = response.json()
 
                 evalscript_true_color = result.get("evalscript_true_color")
-                tampa_bbox_dict = result.get("tampa_bbox")
-
-                tampa_box_coords = {
-                    "min_x": tampa_bbox_dict["min_x"],
-                    "max_x": tampa_bbox_dict["max_x"],
-                    "min_y": tampa_bbox_dict["min_y"],
-                    "max_y": tampa_bbox_dict["max_y"],
-                }
-
-                tampa_box_crs = tampa_bbox_dict["_crs"]
-
-                tampa_bbox = BBox(tampa_box_coords, tampa_box_crs)
-                tampa_size = result.get("tampa_size")
+                tampa_bbox, tampa_size = satellite_box(result)
                 st.write(result.get("bcords_str"))  # writes new box center cords
-                st.write(result.get("nw_rs_str"))  # writes new box resolution (pixels)
+                if result.get("nw_rs_str"):
+                    st.write(result["nw_rs_str"])  # writes new box resolution (pixels)
 
                 beginning_str = beginning.strftime("%Y-%m-%d")
                 ending_str = ending.strftime("%Y-%m-%d")
 
-                tamp_request_tc = SentinelHubRequest(
-                    evalscript=evalscript_true_color,
-                    input_data=[
-                        SentinelHubRequest.input_data(
-                            data_collection=DataCollection.SENTINEL2_L1C,
-                            time_interval=(beginning_str, ending_str),
-                        )
-                    ],
-                    responses=[SentinelHubRequest.output_response("default", MimeType.PNG)],
-                    bbox=tampa_bbox,
-                    size=tampa_size,
-                    config=config,
+                tamp = fetch_true_color(
+                    tampa_bbox,
+                    tampa_size,
+                    (beginning_str, ending_str),
+                    evalscript_true_color,
+                    config,
+                    tile_cache(),
+                    data_collection=DataCollection.SENTINEL2_L1C,
                 )
-                tamp_tc_imgs = tamp_request_tc.get_data()
-                tamp = tamp_tc_imgs[0]
-                image_path = st_plot_image(
-                    tamp, factor=3.5 / 255, clip_range=(0, 1), filename="sat_plot.jpg"
+                image_bytes = st_plot_image(tamp, factor=3.5 / 255, clip_range=(0, 1))
+
+                score = runway_score(tamp)
+                st.write(
+                    f"Runway detector: {runway_verdict(score['confidence'])} "
+                    f"(confidence {score['confidence']:.2f})"
                 )
 
-                OPENAI_KEY = os.environ.get("OPENAI_API_KEY")
-                client = OpenAI(api_key=OPENAI_KEY)
-
-                # Function to encode the image
-                def encode_image(image_path):
-                    with open(image_path, "rb") as image_file:
-                        return base64.b64encode(image_file.read()).decode("utf-8")
-
-                # Getting the base64 string
-                base64_image = encode_image(image_path)
-
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": "Tell me about this image.",
-                                },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/jpeg;base64,{base64_image}"
-                                    },
-                                },
-                            ],
-                        }
-                    ],
-                    max_tokens=300,
+                description = describe_image(
+                    image_bytes, description_store(), openai_client()
                 )
-                st.subheader(response.choices[0].message.content)
+                st.subheader(description)
 
             except requests.exceptions.JSONDecodeError:
                 st.error("Error: The response is not in JSON format.")
                 st.write("Response content:", response.text)
+
+    if len(h3cell_id_list) > 1 and st.button(
+        f"Show me the satellite images of all {len(h3cell_id_list)} selected cells!"
+    ):
+        cells = h3cell_id_list[:SATELLITE_BATCH_MAX]
+        if len(h3cell_id_list) > SATELLITE_BATCH_MAX:
+            st.write(f"Showing the first {SATELLITE_BATCH_MAX} cells of the selection.")
+
+        try:
+            responses = client.gather(
+                *(
+                    partial(
+                        client.post,
+                        "/map",
+                        json={
+                            "data": {
+                                "x_adjust": x_adjust,
+                                "y_adjust": y_adjust,
+                                "cell_id": cell,
+                            }
+                        },
+                    )
+                    for cell in cells
+                )
+            )
+        except requests.exceptions.RequestException as e:
+            st.error(f"Error: could not compute the satellite boxes ({e}).")
+            st.stop()
+
+        columns = st.columns(3)
+        cards = {}
+        slots = {}
+        tiles = {}
+        for i, (cell, response) in enumerate(zip(cells, responses)):
+            cards[cell] = columns[i % 3].container()
+            slots[cell] = cards[cell].empty()
+            try:
+                result = response.json()
+                tiles[cell] = satellite_box(result)
+                evalscript_true_color = result["evalscript_true_color"]
+            except (ValueError, KeyError):
+                slots[cell].error(f"{cell}: the backend could not compute its box.")
+                continue
+            slots[cell].write(f"Loading {cell}...")
+
+        if tiles:
+            progress = st.progress(0.0)
+            time_interval = (beginning.strftime("%Y-%m-%d"), ending.strftime("%Y-%m-%d"))
+            batch = fetch_true_color_batch(
+                tiles, time_interval, evalscript_true_color, config, tile_cache()
+            )
+            ambiguous = {}
+            for done, (cell, image, error) in enumerate(batch, start=1):
+                if error is None:
+                    image_bytes = encode_image(image, factor=3.5 / 255, clip_range=(0, 1))
+                    slots[cell].image(
+                        image_bytes, caption=f"{cell} {h3.cell_to_latlng(cell)}"
+                    )
+                    # The local detector settles the clear cases; only the
+                    # ambiguous tiles go to the vision model
+                    score = runway_score(image)
+                    verdict = runway_verdict(score["confidence"])
+                    cards[cell].caption(
+                        f"Runway detector: {verdict} (confidence {score['confidence']:.2f})"
+                    )
+                    if verdict == "ambiguous":
+                        ambiguous[cell] = image_bytes
+                else:
+                    slots[cell].error(f"{cell}: {error}")
+                progress.progress(done / len(tiles))
+
+            # Several tiles per vision request; tiles described before are not sent
+            with st.spinner("Describing the ambiguous images..."):
+                descriptions = describe_images(
+                    ambiguous, description_store(), openai_client()
+                )
+            for cell, description in descriptions.items():
+                cards[cell].write(description)
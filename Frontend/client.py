@@ -0,0 +1,130 @@
+"""
+Shared HTTP client for calls from the Streamlit pages to the FastAPI backend.
+
+One `requests.Session` per Streamlit process keeps pooled keep-alive
+connections to the backend, so a rerun does not pay for a new TCP connection
+on every call. Independent calls can be run at the same time with `gather`,
+e.g. the map payload and the aircraft-type lookup on the tracker page.
+
+Set BACKEND_URL to point the frontend at another backend, and
+BACKEND_CONNECT_TIMEOUT / BACKEND_READ_TIMEOUT (seconds) to tune the timeouts.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from urllib3.util.retry import Retry
+
+BACKEND_URL = os.environ.get("BACKEND_URL", "http://airport_fastapi_route:5001")
+BACKEND_CONNECT_TIMEOUT = float(os.environ.get("BACKEND_CONNECT_TIMEOUT", 3.05))
+# Long enough for the backend's own map render timeout
+BACKEND_READ_TIMEOUT = float(os.environ.get("BACKEND_READ_TIMEOUT", 65))
+BACKEND_POOL_SIZE = int(os.environ.get("BACKEND_POOL_SIZE", 16))
+
+
+class BackendClient:
+    """
+    A pooled, keep-alive HTTP client for the backend, safe to share between sessions.
+
+    Args:
+        base_url: Base URL of the backend.
+        pool_size: Maximum number of connections kept open per host, which is
+            also the number of calls `gather` runs at the same time.
+        timeout: Default (connect, read) timeout in seconds.
+    """
+
+    def __init__(
+        self,
+        base_url=BACKEND_URL,
+        pool_size=BACKEND_POOL_SIZE,
+        timeout=(BACKEND_CONNECT_TIMEOUT, BACKEND_READ_TIMEOUT),
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+        # Only failed connects are retried; a request that reached the backend is not
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=pool_size,
+            max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2),
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(pool_size, thread_name_prefix="backend")
+
+    def url(self, path):
+        """
+        Builds the absolute URL of a backend path.
+
+        Args:
+            path: The path, e.g. "/map".
+
+        Returns:
+            The URL as a string.
+        """
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def get(self, path, **kwargs):
+        """
+        Sends a GET request to the backend.
+
+        Args:
+            path: The backend path.
+            **kwargs: Passed on to `requests.Session.get`.
+
+        Returns:
+            The `requests` response.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(self.url(path), **kwargs)
+
+    def post(self, path, **kwargs):
+        """
+        Sends a POST request to the backend.
+
+        Args:
+            path: The backend path.
+            **kwargs: Passed on to `requests.Session.post`.
+
+        Returns:
+            The `requests` response.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.post(self.url(path), **kwargs)
+
+    def gather(self, *calls):
+        """
+        Runs independent calls at the same time and waits for all of them.
+
+        The calls run with the current Streamlit script context, so they may
+        read and write `st.session_state`.
+
+        Args:
+            *calls: Functions taking no arguments, e.g. lambdas or `functools.partial`.
+
+        Returns:
+            A list with the result of each call, in order.
+
+        Raises:
+            Exception: The exception of the first call (in order) that failed.
+        """
+        ctx = get_script_run_ctx()
+
+        def run(call):
+            add_script_run_ctx(threading.current_thread(), ctx)
+            return call()
+
+        futures = [self._executor.submit(run, call) for call in calls]
+        return [future.result() for future in futures]
+
+
+@st.cache_resource
+def backend_client():
+    """Creates the backend client once per Streamlit process."""
+    return BackendClient()
@@ -0,0 +1,306 @@
+"""
+Read-only access to the ADS-B dataset stored as an Arrow IPC file.
+
+The file is memory-mapped rather than read into the heap, so opening it is
+instant and a column (say `H3_10_cell`) is only paged in and converted to
+pandas the first time it is asked for. The backend and the frontend open the
+same file, written by Database/make_db.py.
+
+H3 cells are stored once, as the 64-bit integer index of the finest cell
+(`h3_cell`, at H3_RESOLUTION). The `H3_{resolution}_cell` columns of coarser
+resolutions are derived from it on first access by rewriting the index bits,
+which is a few vectorized integer operations over the whole column. Derived
+columns hold integer cell IDs; `h3_to_str` gives the hex strings the UI and
+GeoJSON use.
+"""
+
+import os
+import pickle
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+H3_COLUMN = "h3_cell"
+H3_RESOLUTION = 11
+H3_CELL_COLUMN = re.compile(r"^H3_(\d+)_cell$")
+
+# Layout of an H3 index: 4 resolution bits at 52-55, then 3 bits per digit of
+# resolutions 1-15, with unused digits set to 7
+_H3_RESOLUTION_OFFSET = 52
+_H3_RESOLUTION_MASK = np.uint64(0xF << _H3_RESOLUTION_OFFSET)
+
+
+def _unused_digits(resolution):
+    return (1 << ((15 - resolution) * 3)) - 1
+
+
+def h3_parents(cells, resolution):
+    """
+    Computes the parent of every cell at a coarser resolution.
+
+    Args:
+        cells: H3 cells as unsigned 64-bit integers, at `resolution` or finer.
+        resolution: The resolution of the parents.
+
+    Returns:
+        A uint64 NumPy array of the parent cells. 0 (no cell) stays 0.
+    """
+    cells = np.asarray(cells, dtype=np.uint64)
+    parents = (cells & ~_H3_RESOLUTION_MASK) | np.uint64(
+        (resolution << _H3_RESOLUTION_OFFSET) | _unused_digits(resolution)
+    )
+    return np.where(cells == 0, cells, parents)
+
+
+def h3_descendant_range(cell, resolution=H3_RESOLUTION):
+    """
+    Finds the integer range holding every descendant of a cell at a finer resolution.
+
+    Descendants share the cell's leading digits, so they are contiguous when
+    sorted, and a column of finest cells can be filtered with one range scan.
+
+    Args:
+        cell: The H3 cell as an integer.
+        resolution: The resolution of the descendants.
+
+    Returns:
+        A tuple of (lowest, highest) descendant indexes, both inclusive.
+    """
+    cell_resolution = (cell >> _H3_RESOLUTION_OFFSET) & 0xF
+    highest = (cell & ~int(_H3_RESOLUTION_MASK)) | (resolution << _H3_RESOLUTION_OFFSET)
+    free_digits = _unused_digits(cell_resolution) ^ _unused_digits(resolution)
+    return highest & ~free_digits, highest
+
+
+def h3_to_str(cells):
+    """
+    Converts H3 cells to the hex strings H3 and GeoJSON use.
+
+    Args:
+        cells: Integer cells, or cells that are strings already.
+
+    Returns:
+        An object NumPy array of hex strings, None where there is no cell.
+
+    Raises:
+        TypeError: If the cells are floats, which cannot hold 64-bit cell IDs.
+    """
+    dtype = getattr(cells, "dtype", None)
+    if pd.api.types.is_float_dtype(dtype):
+        raise TypeError(f"H3 cells must be integers or strings, not {dtype}")
+    if not pd.api.types.is_integer_dtype(dtype):
+        return np.asarray(cells, dtype=object)
+    return np.array(
+        [None if cell is pd.NA else format(cell, "x") for cell in cells.tolist()],
+        dtype=object,
+    )
+
+
+def h3_str_to_int(cells):
+    """
+    Converts hex string H3 cells to integers.
+
+    Args:
+        cells: The cells as hex strings.
+
+    Returns:
+        A uint64 NumPy array, 0 for anything that is not a hex string.
+    """
+
+    def parse(cell):
+        try:
+            return int(cell, 16)
+        except (TypeError, ValueError):
+            return 0
+
+    return np.fromiter((parse(cell) for cell in cells), dtype=np.uint64, count=len(cells))
+
+
+def _h3_series(cells, resolution, name):
+    # cells is the Arrow column of finest cells; nulls are kept as pandas NA
+    parents = h3_parents(cells.fill_null(0).to_numpy(), resolution)
+    if cells.null_count:
+        mask = cells.is_null().to_numpy(zero_copy_only=False)
+        return pd.Series(pd.arrays.IntegerArray(parents, mask), name=name)
+    return pd.Series(parents, name=name)
+
+
+class ColumnarDataset:
+    """
+    A memory-mapped Arrow IPC file whose columns are materialized lazily.
+
+    Args:
+        path: Path to the Arrow IPC file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        self._series = {}
+
+    @property
+    def columns(self):
+        """The column names of the dataset, including the derived H3 columns."""
+        columns = self._table.column_names
+        if H3_COLUMN in columns:
+            columns = columns + [
+                f"H3_{resolution}_cell" for resolution in range(H3_RESOLUTION + 1)
+            ]
+        return columns
+
+    @property
+    def table(self):
+        """The memory-mapped Arrow table, with the columns as stored."""
+        return self._table
+
+    def __len__(self):
+        return self._table.num_rows
+
+    def __contains__(self, column):
+        return column in self._table.column_names or self._h3_resolution(column) is not None
+
+    def _h3_resolution(self, column):
+        """The resolution of an H3 column derived from `h3_cell`, or None."""
+        if H3_COLUMN not in self._table.column_names:
+            return None
+        if column == H3_COLUMN:
+            return H3_RESOLUTION
+        match = H3_CELL_COLUMN.match(column)
+        if match is None or int(match.group(1)) > H3_RESOLUTION:
+            return None
+        return int(match.group(1))
+
+    def __getitem__(self, column):
+        """
+        Returns one column as a pandas Series, converting it on first access.
+
+        Args:
+            column: The column name.
+
+        Returns:
+            The column as a pandas Series.
+        """
+        if column not in self._series:
+            resolution = self._h3_resolution(column)
+            if resolution is not None:
+                cells = self._table.column(H3_COLUMN)
+                self._series[column] = _h3_series(cells, resolution, column)
+            else:
+                self._series[column] = self._table.column(column).to_pandas().rename(column)
+        return self._series[column]
+
+    def frame(self, columns):
+        """
+        Returns a DataFrame of the requested columns only.
+
+        Args:
+            columns: The column names to include.
+
+        Returns:
+            A pandas DataFrame with one column per requested name.
+        """
+        return pd.DataFrame({column: self[column] for column in columns}, copy=False)
+
+    def take(self, rows, columns):
+        """
+        Returns the given rows of the requested columns, read straight from the
+        memory-mapped file without materializing the whole columns.
+
+        Args:
+            rows: Row numbers to take, in the order they should be returned.
+            columns: The column names to include.
+
+        Returns:
+            A pandas DataFrame with one row per requested row number.
+        """
+        resolutions = {column: self._h3_resolution(column) for column in columns}
+        derived = {column: res for column, res in resolutions.items() if res is not None}
+        if not derived:
+            return self._table.select(columns).take(rows).to_pandas()
+
+        stored = [column for column in columns if column not in derived]
+        table = self._table.select(stored + [H3_COLUMN]).take(rows)
+        if stored:
+            df = table.select(stored).to_pandas()
+        else:
+            df = pd.DataFrame(index=pd.RangeIndex(table.num_rows))
+        for column, resolution in derived.items():
+            df[column] = _h3_series(table.column(H3_COLUMN), resolution, column)
+        return df[list(columns)]
+
+
+def write_dataset(df, path):
+    """
+    Writes a DataFrame to an Arrow IPC file, replacing any existing file atomically.
+
+    Readers that already have the old file mapped keep reading the old contents.
+    The temporary file is written next to `path`, so the final rename stays on
+    one filesystem. String `H3_{resolution}_cell` columns are replaced by the
+    integer `h3_cell` column of the finest one.
+
+    Args:
+        df: The DataFrame to write. A `geometry` column, if present, is dropped.
+        path: Path to the Arrow IPC file.
+    """
+    df = pd.DataFrame(df.drop(columns="geometry", errors="ignore"))
+    finest = f"H3_{H3_RESOLUTION}_cell"
+    if finest in df and H3_COLUMN not in df:
+        cells = df[finest]
+        df[H3_COLUMN] = pd.arrays.IntegerArray(
+            h3_str_to_int(cells.fillna("")), cells.isna().to_numpy()
+        )
+    df = df.drop(columns=[column for column in df.columns if H3_CELL_COLUMN.match(column)])
+    # Mixed-type object columns (alt_baro holds numbers and "ground") are stored as text
+    for column in df.columns[df.dtypes == object]:
+        df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def open_dataset(path, legacy_pickle=None, convert=False):
+    """
+    Opens the dataset, read-only unless the caller owns the file.
+
+    Database/make_db.py writes the file, and only the backend passes
+    `convert=True`. The map workers, the frontend and the scripts open the file as
+    it is, so no reader ever rewrites the file the others have mapped.
+
+    With `convert=True`, a legacy pickled (Geo)DataFrame is converted when the
+    Arrow file does not exist yet, and a file written before the integer
+    `h3_cell` column existed is rewritten once in the current layout.
+
+    Args:
+        path: Path to the Arrow IPC file.
+        legacy_pickle: Optional path of a pickled (Geo)DataFrame to convert when
+            the Arrow file does not exist yet. Only used with `convert=True`.
+        convert: Whether this caller may write the file.
+
+    Returns:
+        A ColumnarDataset.
+
+    Raises:
+        FileNotFoundError: If there is no dataset at `path`.
+        ValueError: If the file is in the legacy layout and `convert` is False.
+    """
+    has_pickle = legacy_pickle is not None and os.path.exists(legacy_pickle)
+    if convert and has_pickle and not os.path.isfile(path):
+        with open(legacy_pickle, "rb") as f:
+            write_dataset(pickle.load(f), path)
+    dataset = ColumnarDataset(path)
+    stored = dataset.table.column_names
+    if H3_COLUMN in stored or f"H3_{H3_RESOLUTION}_cell" not in stored:
+        return dataset
+    if not convert:
+        raise ValueError(
+            f"{path} has string H3 columns; start the backend or run "
+            "Database/make_db.py to convert it"
+        )
+    write_dataset(dataset.table.to_pandas(), path)
+    return ColumnarDataset(path)
@@ -3,8 +3,8 @@ This script launches a streamlit app that is the home page of a ADSB
 data based data science project.
 """
 
-import pickle
 import streamlit as st
+from utils import shared_dataset
 
 def home_page():
 
@@ -16,7 +16,5 @@ def home_page():
     st.write("""#### 1. Predict the location of airports in Florida.""")
     st.write("#### 2. Track flight paths of specific planes in Florida.")
 
-    if "tracker_geo_dataframe.pkl" not in st.session_state:
-        with open("geo_dataframe.pkl", "rb") as f:
-            geo_dataframe = pickle.load(f)
-        st.session_state["tracker_geo_dataframe.pkl"] = geo_dataframe
+    # Opens the process-wide dataset shared by every session, if not already open
+    shared_dataset()
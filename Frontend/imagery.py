@@ -0,0 +1,281 @@
+"""
+Disk cache in front of Sentinel Hub satellite imagery requests.
+
+Tiles are content-addressed by (bbox, size, time interval, data collection,
+evalscript hash), so pressing "Show me the satellite image!" again for the same
+cell and dates reads the decoded array from disk instead of spending processing
+units. The cache is capped in bytes and evicts the least recently used tiles.
+
+Several tiles can be fetched at once with `fetch_true_color_batch`, which runs
+the requests on a bounded thread pool under a shared rate limit, retries failed
+downloads with exponential backoff and yields each tile as soon as it arrives.
+
+Set SH_BASE_URL (and SH_TOKEN_URL) to point the Sentinel client at a local stand-in.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import requests
+from sentinelhub import DataCollection, MimeType, SentinelHubRequest
+from sentinelhub.exceptions import DownloadFailedException
+
+TILE_CACHE_DIR = os.environ.get("TILE_CACHE_DIR", "tile_cache")
+TILE_CACHE_BYTES = int(os.environ.get("TILE_CACHE_BYTES", 2 * 1024**3))
+
+SENTINEL_WORKERS = int(os.environ.get("SENTINEL_WORKERS", 4))
+SENTINEL_REQUESTS_PER_SECOND = float(os.environ.get("SENTINEL_REQUESTS_PER_SECOND", 2))
+SENTINEL_RETRIES = 3
+SENTINEL_BACKOFF = 1.0  # seconds before the first retry, doubled after each one
+
+
+def tile_key(bbox, size, time_interval, data_collection, evalscript):
+    """
+    Computes the content address of a Sentinel Hub tile request.
+
+    Args:
+        bbox: The sentinelhub BBox of the tile.
+        size: The (width, height) of the tile in pixels.
+        time_interval: The (start, end) dates of the request.
+        data_collection: The sentinelhub DataCollection.
+        evalscript: The evalscript source.
+
+    Returns:
+        The hex SHA-256 key of the request.
+    """
+    request = {
+        "bbox": [float(v) for v in bbox],
+        "crs": str(bbox.crs),
+        "size": [int(v) for v in size],
+        "time_interval": [str(v) for v in time_interval],
+        "data_collection": data_collection.name,
+        "evalscript": hashlib.sha256(evalscript.encode()).hexdigest(),
+    }
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+
+class TileCache:
+    """
+    Decoded imagery arrays on disk, bounded by total file size with LRU eviction.
+
+    Args:
+        directory: Directory holding the cached tiles, created if needed.
+        max_bytes: Total size of the cached files before old tiles are evicted.
+    """
+
+    def __init__(self, directory=TILE_CACHE_DIR, max_bytes=TILE_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key):
+        """
+        Reads a tile and marks it as recently used.
+
+        Args:
+            key: The key from `tile_key`.
+
+        Returns:
+            The image as a NumPy array, or None on a miss.
+        """
+        path = self._path(key)
+        try:
+            with np.load(path) as tile:
+                image = tile["image"]
+            os.utime(path)
+        except (FileNotFoundError, ValueError, KeyError, OSError):
+            return None
+        return image
+
+    def put(self, key, image):
+        """
+        Stores a tile, then evicts the least recently used tiles over the size cap.
+
+        Args:
+            key: The key from `tile_key`.
+            image: The image as a NumPy array.
+        """
+        tmp_path = os.path.join(self.directory, f".{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, image=image)
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+
+    def evict(self):
+        """Deletes the least recently used tiles until the cache fits in max_bytes."""
+        with self._lock:
+            tiles = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".npz"):
+                    stat = entry.stat()
+                    tiles.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in tiles)
+            for _, size, path in sorted(tiles):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+class RateLimiter:
+    """
+    Spaces out calls evenly so that at most `rate` happen per second, across threads.
+
+    Args:
+        rate: Maximum number of calls per second.
+    """
+
+    def __init__(self, rate=SENTINEL_REQUESTS_PER_SECOND):
+        self.interval = 1.0 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Blocks until the caller may make its next call."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        time.sleep(start - now)
+
+
+def fetch_true_color(
+    bbox,
+    size,
+    time_interval,
+    evalscript,
+    config,
+    cache,
+    data_collection=DataCollection.SENTINEL2_L1C,
+    rate_limiter=None,
+    retries=0,
+    backoff=SENTINEL_BACKOFF,
+):
+    """
+    Returns a Sentinel Hub true color tile, from the cache when possible.
+
+    Args:
+        bbox: The sentinelhub BBox of the tile.
+        size: The (width, height) of the tile in pixels.
+        time_interval: The (start, end) dates of the request, as "YYYY-MM-DD" strings.
+        evalscript: The evalscript source.
+        config: The sentinelhub SHConfig to request with.
+        cache: A TileCache.
+        data_collection: The sentinelhub DataCollection to request.
+        rate_limiter: Optional RateLimiter that each download waits for.
+            Cache hits do not count against it.
+        retries: Number of times a failed download is tried again.
+        backoff: Seconds to wait before the first retry, doubled after each one.
+
+    Returns:
+        The image as a NumPy array.
+
+    Raises:
+        sentinelhub.exceptions.DownloadFailedException: If the last attempt fails.
+    """
+    key = tile_key(bbox, size, time_interval, data_collection, evalscript)
+    image = cache.get(key)
+    if image is not None:
+        return image
+
+    request = SentinelHubRequest(
+        evalscript=evalscript,
+        input_data=[
+            SentinelHubRequest.input_data(
+                data_collection=data_collection,
+                time_interval=time_interval,
+            )
+        ],
+        responses=[SentinelHubRequest.output_response("default", MimeType.PNG)],
+        bbox=bbox,
+        size=size,
+        config=config,
+    )
+    for attempt in range(retries + 1):
+        if rate_limiter is not None:
+            rate_limiter.wait()
+        try:
+            image = request.get_data()[0]
+            break
+        except (DownloadFailedException, requests.exceptions.RequestException):
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2**attempt)
+    cache.put(key, image)
+    return image
+
+
+def fetch_true_color_batch(
+    tiles,
+    time_interval,
+    evalscript,
+    config,
+    cache,
+    data_collection=DataCollection.SENTINEL2_L1C,
+    max_workers=SENTINEL_WORKERS,
+    rate_limiter=None,
+    retries=SENTINEL_RETRIES,
+):
+    """
+    Fetches several true color tiles concurrently, yielding each as it arrives.
+
+    Args:
+        tiles: A dict mapping a tile ID (e.g. the H3 cell) to its (bbox, size).
+        time_interval: The (start, end) dates of the requests, as "YYYY-MM-DD" strings.
+        evalscript: The evalscript source.
+        config: The sentinelhub SHConfig to request with.
+        cache: A TileCache.
+        data_collection: The sentinelhub DataCollection to request.
+        max_workers: Number of tiles downloaded at the same time.
+        rate_limiter: RateLimiter shared by the downloads, by default one
+            allowing SENTINEL_REQUESTS_PER_SECOND.
+        retries: Number of times a failed download is tried again.
+
+    Yields:
+        Tuples of (tile ID, image, error) in completion order, where either the
+        image is a NumPy array and error is None, or the image is None and error
+        is the exception of the last attempt.
+    """
+    if rate_limiter is None:
+        rate_limiter = RateLimiter()
+
+    with ThreadPoolExecutor(max_workers) as pool:
+        futures = {
+            pool.submit(
+                fetch_true_color,
+                bbox,
+                size,
+                time_interval,
+                evalscript,
+                config,
+                cache,
+                data_collection=data_collection,
+                rate_limiter=rate_limiter,
+                retries=retries,
+            ): tile_id
+            for tile_id, (bbox, size) in tiles.items()
+        }
+        try:
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    yield futures[future], None, e
+        finally:
+            # Stop early when the caller stops reading, e.g. on a Streamlit rerun
+            for future in futures:
+                future.cancel()
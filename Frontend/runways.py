@@ -0,0 +1,300 @@
+"""
+A fast, CPU-only runway detector used to screen satellite tiles before the
+vision model sees them.
+
+A runway shows up as a long, straight strip with a bright/dark edge on either
+side: two parallel lines of opposite gradient polarity a few pixels apart.
+The detector, in NumPy only:
+
+1. converts the tile to grayscale and block-averages it to RUNWAY_WORKING_SIZE;
+2. finds one-pixel-wide edges with a Sobel filter and non-maximum suppression;
+3. lets every edge pixel vote for the lines through it near its own gradient
+   direction (a Hough transform restricted to a few angle bins per pixel), into
+   one accumulator per gradient polarity;
+4. picks the best pair of parallel lines of opposite polarity RUNWAY_WIDTHS apart;
+5. measures how far both lines run side by side along the edge pixels.
+
+That length relative to the tile, discounted when the tile is full of edges
+(cities, fields), gives a confidence in [0, 1] in tens of milliseconds per tile.
+Tiles between RUNWAY_UNLIKELY and RUNWAY_LIKELY are the ambiguous ones worth
+sending to the vision model.
+"""
+
+import numpy as np
+
+RUNWAY_WORKING_SIZE = 512
+RUNWAY_THETA_BINS = 360  # half degree bins
+RUNWAY_THETA_SPREAD = 20  # bins (10 degrees) voted for on each side of the gradient direction
+RUNWAY_CANDIDATE_ANGLES = 24  # angle bins searched for strips
+RUNWAY_RHO_TOLERANCE = 2  # pixels a straight edge may wander off its line
+RUNWAY_MAX_GAP = 8  # pixels an edge may break off along its line and still count as one
+RUNWAY_WIDTHS = range(2 * RUNWAY_RHO_TOLERANCE + 1, 16)  # strip widths in working-size pixels
+RUNWAY_EDGE_THRESHOLD = 0.5  # Sobel magnitude of a 1/8 contrast step
+RUNWAY_MIN_LENGTH = 0.35  # fraction of the tile side for full confidence
+RUNWAY_CLUTTER = (0.05, 0.15)  # edge pixel fractions where confidence starts/ends dropping
+RUNWAY_LIKELY = 0.7
+RUNWAY_UNLIKELY = 0.2
+
+
+def to_grayscale(image, size=RUNWAY_WORKING_SIZE):
+    """
+    Converts a tile to a grayscale image of about `size` pixels, scaled by its brightness.
+
+    Args:
+        image: The tile as an (H, W, 3) RGB or (H, W) NumPy array, any dtype.
+        size: Longest side of the result, reached by block averaging.
+
+    Returns:
+        A float32 array with values in [0, 1].
+    """
+    image = np.asarray(image)
+    step = max(1, -(-max(image.shape[:2]) // size))
+    height, width = image.shape[0] // step * step, image.shape[1] // step * step
+
+    # Block average first, so only the small image is converted to float. Strided
+    # adds are much faster than a mean over a reshaped 5D view.
+    image = image[:height, :width]
+    fits_uint16 = image.dtype == np.uint8 and step <= 16
+    rows = image[0::step].astype(np.uint16 if fits_uint16 else np.float32)
+    for offset in range(1, step):
+        rows += image[offset::step]
+    blocks = rows[:, 0::step].copy()
+    for offset in range(1, step):
+        blocks += rows[:, offset::step]
+    image = blocks.astype(np.float32) / (step * step)
+    if image.ndim == 3:
+        image = image[..., :3] @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+    # Relative to the tile's brightness, so flat tiles keep a low contrast
+    return np.clip(image / max(np.percentile(image, 99), 1e-6), 0, 1)
+
+
+def sobel(gray):
+    """
+    Computes the Sobel gradients of a grayscale image.
+
+    Args:
+        gray: A 2D float array.
+
+    Returns:
+        A tuple of (gx, gy) arrays of the same shape.
+    """
+    p = np.pad(gray, 1, mode="edge")
+    gx = (p[:-2, 2:] + 2 * p[1:-1, 2:] + p[2:, 2:]) - (
+        p[:-2, :-2] + 2 * p[1:-1, :-2] + p[2:, :-2]
+    )
+    gy = (p[2:, :-2] + 2 * p[2:, 1:-1] + p[2:, 2:]) - (
+        p[:-2, :-2] + 2 * p[:-2, 1:-1] + p[:-2, 2:]
+    )
+    return gx, gy
+
+
+def thin_edges(gx, gy, threshold=RUNWAY_EDGE_THRESHOLD):
+    """
+    Finds one-pixel-wide edges: strong gradients that are the largest across the edge.
+
+    Args:
+        gx: Horizontal gradient.
+        gy: Vertical gradient.
+        threshold: Minimum gradient magnitude of an edge.
+
+    Returns:
+        A boolean mask of the edge pixels.
+    """
+    magnitude = np.hypot(gx, gy)
+    # Gradient direction rounded to 0, 45, 90 or 135 degrees
+    sector = (np.mod(np.degrees(np.arctan2(gy, gx)) + 22.5, 180) // 45).astype(np.int64)
+
+    p = np.pad(magnitude, 1)
+    before = np.choose(sector, [p[1:-1, :-2], p[:-2, :-2], p[:-2, 1:-1], p[:-2, 2:]])
+    after = np.choose(sector, [p[1:-1, 2:], p[2:, 2:], p[2:, 1:-1], p[2:, :-2]])
+    return (magnitude > threshold) & (magnitude >= before) & (magnitude >= after)
+
+
+def line_votes(gx, gy, edges, theta_bins=RUNWAY_THETA_BINS, spread=RUNWAY_THETA_SPREAD):
+    """
+    Hough accumulators of the edge pixels, split by gradient polarity.
+
+    Each edge pixel votes for the lines through it whose normal is within
+    `spread` bins of its gradient direction, so noisy gradients still meet at
+    the true angle while flat directions get no votes.
+
+    Args:
+        gx: Horizontal gradient.
+        gy: Vertical gradient.
+        edges: Boolean mask of the edge pixels.
+        theta_bins: Number of line-normal angle bins over [0, pi).
+        spread: Number of neighbouring angle bins voted for on each side.
+
+    Returns:
+        An int array of shape (2, theta_bins, 2 * diagonal + 1), indexed by
+        (polarity, angle bin, rho + diagonal). Each rho counts the votes
+        within RUNWAY_RHO_TOLERANCE pixels of it.
+    """
+    ys, xs = np.nonzero(edges)
+    phi = np.arctan2(gy[ys, xs], gx[ys, xs])
+    negative = phi < 0  # gradient points against the line normal
+    theta_bin = (np.mod(phi, np.pi) * (theta_bins / np.pi)).astype(np.int64)
+
+    offsets = np.arange(-spread, spread + 1)
+    vote_bin = theta_bin[:, None] + offsets  # (pixels, 2 * spread + 1)
+    # Angles wrap around at pi with the sign of rho flipped
+    wrapped = (vote_bin < 0) | (vote_bin >= theta_bins)
+    vote_bin = np.mod(vote_bin, theta_bins)
+    centers = (np.arange(theta_bins) + 0.5) * (np.pi / theta_bins)
+    cos, sin = np.cos(centers).astype(np.float32), np.sin(centers).astype(np.float32)
+
+    diagonal = int(np.ceil(np.hypot(*edges.shape)))
+    rho = np.rint(xs[:, None] * cos[vote_bin] + ys[:, None] * sin[vote_bin])
+    rho = np.where(wrapped, -rho, rho).astype(np.int64) + diagonal
+    polarity = negative[:, None] ^ wrapped
+    n_rho = 2 * diagonal + 1
+
+    flat = (polarity * theta_bins + vote_bin) * n_rho + rho
+    votes = np.bincount(flat.ravel(), minlength=2 * theta_bins * n_rho).astype(np.int32)
+    votes = votes.reshape(2, theta_bins, n_rho)
+
+    # Tolerate RUNWAY_RHO_TOLERANCE pixels of drift along the line
+    window = 2 * RUNWAY_RHO_TOLERANCE + 1
+    cumulative = np.cumsum(
+        np.pad(votes, ((0, 0), (0, 0), (RUNWAY_RHO_TOLERANCE + 1, RUNWAY_RHO_TOLERANCE))),
+        axis=2,
+    )
+    return cumulative[..., window:] - cumulative[..., :-window]
+
+
+def edge_runs(positions, gap=RUNWAY_MAX_GAP):
+    """
+    Splits positions along a line into runs without gaps longer than `gap`.
+
+    Args:
+        positions: Positions of edge pixels along the line, in pixels.
+        gap: Longest gap allowed inside a run.
+
+    Returns:
+        A tuple of (starts, ends) arrays, one entry per run.
+    """
+    positions = np.sort(positions)
+    breaks = np.flatnonzero(np.diff(positions) > gap)
+    return positions[np.r_[0, breaks + 1]], positions[np.r_[breaks, -1]]
+
+
+def strip_length(gx, gy, edges, theta, rho, width):
+    """
+    Measures how far the two edges of a strip run side by side.
+
+    Args:
+        gx: Horizontal gradient.
+        gy: Vertical gradient.
+        edges: Boolean mask of the edge pixels.
+        theta: Angle of the strip's normal in radians, in [0, pi).
+        rho: Distance of the strip's first edge from the origin along the normal.
+        width: Distance from the first edge to the second.
+
+    Returns:
+        Length in pixels of the longest stretch where both edges have edge pixels
+        on their line, with gaps of at most RUNWAY_MAX_GAP.
+    """
+    ys, xs = np.nonzero(edges)
+    cos, sin = np.cos(theta), np.sin(theta)
+    # Only pixels whose gradient is close to the normal belong to the strip's edges
+    spread = np.pi * RUNWAY_THETA_SPREAD / RUNWAY_THETA_BINS
+    phi = np.arctan2(gy[ys, xs], gx[ys, xs])
+    aligned = np.abs(np.sin(phi - theta)) <= np.sin(spread)
+    across = xs * cos + ys * sin
+    along = ys * cos - xs * sin
+
+    runs = []
+    for offset in (rho, rho + width):
+        near = aligned & (np.abs(across - offset) <= RUNWAY_RHO_TOLERANCE)
+        if not near.any():
+            return 0.0
+        # Centred on the edge itself, as the votes only place it within the tolerance
+        center = np.median(across[near])
+        on_line = aligned & (np.abs(across - center) <= RUNWAY_RHO_TOLERANCE)
+        runs.append(edge_runs(along[on_line]))
+    (starts_a, ends_a), (starts_b, ends_b) = runs
+    overlaps = np.minimum(ends_a[:, None], ends_b[None, :]) - np.maximum(
+        starts_a[:, None], starts_b[None, :]
+    )
+    return float(max(overlaps.max(), 0.0))
+
+
+def runway_score(image, widths=RUNWAY_WIDTHS):
+    """
+    Scores how much a tile looks like it contains a runway.
+
+    Args:
+        image: The tile as an (H, W, 3) RGB or (H, W) NumPy array.
+        widths: Strip widths to look for, in working-size pixels.
+
+    Returns:
+        A dict with:
+            - "confidence": Runway confidence in [0, 1].
+            - "length": Length of the best strip as a fraction of the tile side.
+            - "angle": Direction of the best strip in degrees, clockwise from north.
+            - "width": Width of the best strip in working-size pixels.
+            - "clutter": Fraction of the tile's pixels that are edges.
+    """
+    gray = to_grayscale(image)
+    gx, gy = sobel(gray)
+    edges = thin_edges(gx, gy)
+    clutter = float(edges.mean())
+    clutter_lo, clutter_hi = RUNWAY_CLUTTER
+
+    best, best_theta, best_rho, best_width = 0, 0, 0, 0
+    # A tile this busy scores 0 whatever its lines, so the vote is skipped
+    if clutter < clutter_hi:
+        positive, negative = line_votes(gx, gy, edges)
+        # Only the angles with the strongest lines of both polarities can hold the best strip
+        strength = np.minimum(positive.max(axis=1), negative.max(axis=1))
+        angles = np.argsort(strength)[-RUNWAY_CANDIDATE_ANGLES:]
+        positive, negative = positive[angles], negative[angles]
+        for width in widths:
+            # A strip is a line of one polarity with one of the other `width` further out
+            pairs = np.maximum(
+                np.minimum(positive[:, :-width], negative[:, width:]),
+                np.minimum(negative[:, :-width], positive[:, width:]),
+            )
+            strongest = pairs.argmax()
+            if pairs.flat[strongest] > best:
+                best, best_width = int(pairs.flat[strongest]), width
+                best_theta = angles[strongest // pairs.shape[1]]
+                best_rho = strongest % pairs.shape[1]
+
+    # The votes of the pair also count pixels off the strip's ends, so its
+    # length is measured along the edge pixels instead
+    length = 0.0
+    if best > 0:
+        theta = (best_theta + 0.5) * np.pi / RUNWAY_THETA_BINS
+        diagonal = int(np.ceil(np.hypot(*edges.shape)))
+        extent = strip_length(gx, gy, edges, theta, best_rho - diagonal, best_width)
+        length = min(extent / max(gray.shape), 1.0)
+    tidiness = np.clip((clutter_hi - clutter) / (clutter_hi - clutter_lo), 0, 1)
+    confidence = float(np.clip(length / RUNWAY_MIN_LENGTH, 0, 1) * tidiness)
+
+    normal = (best_theta + 0.5) * 180 / RUNWAY_THETA_BINS
+    return {
+        "confidence": confidence,
+        "length": float(length),
+        "angle": float(normal % 180),
+        "width": best_width,
+        "clutter": clutter,
+    }
+
+
+def runway_verdict(confidence):
+    """
+    Sorts a runway confidence into a verdict.
+
+    Args:
+        confidence: The "confidence" of a `runway_score`.
+
+    Returns:
+        "runway", "no runway" or "ambiguous".
+    """
+    if confidence >= RUNWAY_LIKELY:
+        return "runway"
+    if confidence <= RUNWAY_UNLIKELY:
+        return "no runway"
+    return "ambiguous"
@@ -0,0 +1,97 @@
+"""
+A small persistent key-value store backed by SQLite.
+
+Values are stored as JSON with the time they were written, and can expire after
+a time-to-live. When a maximum number of entries is set, the least recently
+read entries are evicted first. The store is safe to share between Streamlit's
+session threads and between processes (the app and a prefetch job).
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+
+class DiskStore:
+    """
+    A persistent JSON key-value store with optional TTL and LRU eviction.
+
+    Args:
+        path: Path to the SQLite file, created if needed.
+        ttl: Seconds after which an entry expires, or None to keep entries forever.
+        max_entries: Maximum number of entries, or None for no limit.
+    """
+
+    def __init__(self, path, ttl=None, max_entries=None):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT, stored_at REAL, accessed_at REAL)"
+        )
+        self._conn.commit()
+
+    def _is_fresh(self, stored_at):
+        return self.ttl is None or time.time() - stored_at < self.ttl
+
+    def get(self, key):
+        """
+        Reads an entry.
+
+        Args:
+            key: The entry key.
+
+        Returns:
+            The stored value, or None if it is missing or expired.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or not self._is_fresh(row[1]):
+                return None
+            if self.max_entries is not None:
+                self._conn.execute(
+                    "UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key)
+                )
+                self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        """
+        Writes an entry, evicting the least recently read ones if the store is full.
+
+        Args:
+            key: The entry key.
+            value: A JSON serializable value.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, stored_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            if self.max_entries is not None:
+                self._conn.execute(
+                    "DELETE FROM entries WHERE key IN ("
+                    "SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+
+    def fresh_keys(self):
+        """
+        Lists the keys of every entry that has not expired.
+
+        Returns:
+            A set of keys.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT key, stored_at FROM entries").fetchall()
+        return {key for key, stored_at in rows if self._is_fresh(stored_at)}
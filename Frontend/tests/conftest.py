@@ -0,0 +1,52 @@
+"""Pytest configuration and fixtures of the frontend tests."""
+
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# The frontend modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """Serves the server's `pages`, keeping connections alive, and logs each request."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self.server.requests.append((self.path, self.client_address[1]))
+        status, body, delay = self.server.pages.get(self.path, (404, "", 0))
+        time.sleep(delay)
+        body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+@pytest.fixture(name="http_server")
+def http_server_fixture():
+    """
+    A local HTTP server standing in for the sites the frontend calls.
+
+    Set `pages[path] = (status, body, delay)` to serve a page; other paths are
+    404. `requests` lists the (path, client port) of every request received.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    server.daemon_threads = True
+    server.pages = {}
+    server.requests = []
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
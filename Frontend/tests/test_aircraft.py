@@ -0,0 +1,99 @@
+"""Tests of the aircraft-type store against a local stand-in for Skybrary."""
+
+import json
+
+import pytest
+
+import aircraft
+from aircraft import (
+    lookup_aircraft_type,
+    open_aircraft_store,
+    parse_aircraft_page,
+    prefetch_aircraft_types,
+)
+from store import DiskStore
+
+
+def skybrary_page(name, description):
+    """A Skybrary-like page with its article in JSON-LD."""
+    article = {"@type": "Article", "name": name, "description": description}
+    graph = {"@graph": [{"@type": "WebPage"}, article]}
+    return (
+        "<html><head><script type=\"application/ld+json\">"
+        f"{json.dumps(graph)}</script></head><body></body></html>"
+    )
+
+
+@pytest.fixture(name="skybrary")
+def skybrary_fixture(http_server, monkeypatch):
+    """The local server with pages for the B738 and the A320."""
+    http_server.pages["/aircraft/b738"] = (200, skybrary_page("Boeing 737-800", "Jet"), 0)
+    http_server.pages["/aircraft/a320"] = (200, skybrary_page("Airbus A320", "Jet"), 0)
+    http_server.pages["/aircraft/down"] = (503, "", 0)
+    monkeypatch.setattr(aircraft, "SKYBRARY_URL", f"{http_server.url}/aircraft")
+    return http_server
+
+
+def test_parse_aircraft_page():
+    """The name and description come from the Article of the JSON-LD graph."""
+    info = parse_aircraft_page(skybrary_page("Cessna 172", "Piston"))
+
+    assert info == {"name": "Cessna 172", "description": "Piston"}
+    assert parse_aircraft_page("<html></html>") is None
+
+
+def test_lookup_is_fetched_once(skybrary, tmp_path):
+    """A type is fetched on the first lookup and read from the store afterwards."""
+    store = open_aircraft_store(str(tmp_path / "aircraft.db"))
+
+    for _ in range(3):
+        info = lookup_aircraft_type("B738", store)
+
+    assert info["name"] == "Boeing 737-800"
+    assert [path for path, _ in skybrary.requests] == ["/aircraft/b738"]
+
+
+def test_lookup_stores_unknown_types(skybrary, tmp_path):
+    """Types without a page are stored as unknown instead of fetched again."""
+    store = open_aircraft_store(str(tmp_path / "aircraft.db"))
+
+    assert lookup_aircraft_type("ZZZZ", store) is None
+    assert lookup_aircraft_type("ZZZZ", store) is None
+    assert len(skybrary.requests) == 1
+
+
+def test_lookup_does_not_store_failures(skybrary, tmp_path):
+    """A failed fetch returns None and is retried on the next lookup."""
+    store = open_aircraft_store(str(tmp_path / "aircraft.db"))
+
+    assert lookup_aircraft_type("down", store) is None
+    assert lookup_aircraft_type("down", store) is None
+    assert len(skybrary.requests) == 2
+    assert store.fresh_keys() == set()
+
+
+def test_prefetch_fetches_missing_types(skybrary, tmp_path):
+    """Prefetching skips the types already stored, and stores the rest."""
+    store = open_aircraft_store(str(tmp_path / "aircraft.db"))
+    lookup_aircraft_type("B738", store)
+
+    fetched = prefetch_aircraft_types(["B738", "A320", "a320", "ZZZZ"], store)
+
+    assert fetched == 2
+    assert store.fresh_keys() == {"b738", "a320", "zzzz"}
+    assert sorted(path for path, _ in skybrary.requests) == [
+        "/aircraft/a320",
+        "/aircraft/b738",
+        "/aircraft/zzzz",
+    ]
+
+
+def test_store_expires_entries(tmp_path):
+    """Entries older than the TTL are neither read nor listed as fresh."""
+    path = str(tmp_path / "store.db")
+    DiskStore(path).put("old", {"info": None})
+
+    store = DiskStore(path, ttl=0)
+
+    assert store.get("old") is None
+    assert store.fresh_keys() == set()
@@ -0,0 +1,29 @@
+"""Tests of the shared backend client against a local server."""
+
+import time
+
+from client import BackendClient
+
+
+def test_client_keeps_connections_alive(http_server):
+    """Consecutive calls reuse one pooled connection."""
+    http_server.pages["/health"] = (200, "ok", 0)
+    client = BackendClient(f"{http_server.url}/")
+
+    responses = [client.get("/health") for _ in range(3)]
+
+    assert [response.text for response in responses] == ["ok"] * 3
+    assert len({port for _, port in http_server.requests}) == 1
+
+
+def test_gather_runs_calls_at_the_same_time(http_server):
+    """gather returns the results in order, waiting for the slowest call only."""
+    for i in range(4):
+        http_server.pages[f"/slow/{i}"] = (200, str(i), 0.3)
+    client = BackendClient(http_server.url, pool_size=4)
+
+    started = time.perf_counter()
+    texts = client.gather(*[lambda i=i: client.get(f"slow/{i}").text for i in range(4)])
+
+    assert texts == ["0", "1", "2", "3"]
+    assert time.perf_counter() - started < 1.0
@@ -0,0 +1,95 @@
+"""Tests of the Sentinel tile cache on real tile arrays."""
+
+import os
+import time
+
+import numpy as np
+from sentinelhub import CRS, BBox, DataCollection
+
+from imagery import (
+    RateLimiter,
+    TileCache,
+    fetch_true_color,
+    fetch_true_color_batch,
+    tile_key,
+)
+
+BBOX = BBox((-82.55, 27.95, -82.50, 28.00), crs=CRS.WGS84)
+INTERVAL = ("2024-06-01", "2024-06-30")
+EVALSCRIPT = "//VERSION=3\nfunction evaluatePixel(s) { return [s.B04, s.B03, s.B02]; }"
+
+
+def tile(seed, size=64):
+    """A random RGB tile, which compresses about as badly as imagery."""
+    return np.random.default_rng(seed).integers(0, 256, (size, size, 3), dtype=np.uint8)
+
+
+def key(size=(64, 64), evalscript=EVALSCRIPT):
+    """The key of a tile of BBOX over INTERVAL."""
+    return tile_key(BBOX, size, INTERVAL, DataCollection.SENTINEL2_L1C, evalscript)
+
+
+def test_tile_key_depends_on_the_request():
+    """Keys are stable for a request and change with its size or evalscript."""
+    assert key() == key()
+    assert key(size=(128, 128)) != key()
+    assert key(evalscript=EVALSCRIPT + " ") != key()
+
+
+def test_cache_round_trip(tmp_path):
+    """A stored tile is read back unchanged, and unknown keys miss."""
+    cache = TileCache(str(tmp_path))
+    image = tile(0)
+
+    cache.put(key(), image)
+
+    np.testing.assert_array_equal(cache.get(key()), image)
+    assert cache.get(key(size=(1, 1))) is None
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Over the size cap, the tile read longest ago is deleted first."""
+    cache = TileCache(str(tmp_path))
+    for i in range(3):
+        cache.put(str(i), tile(0))
+        os.utime(os.path.join(tmp_path, f"{i}.npz"), (i, i))
+    tile_bytes = os.path.getsize(os.path.join(tmp_path, "0.npz"))
+    cache.get("0")  # now the most recently used
+
+    cache.max_bytes = 3 * tile_bytes
+    cache.put("3", tile(0))
+
+    assert cache.get("1") is None
+    assert all(cache.get(k) is not None for k in ("0", "2", "3"))
+
+
+def test_cached_tiles_are_not_downloaded(tmp_path):
+    """Cache hits return without a Sentinel Hub request, or even a config."""
+    cache = TileCache(str(tmp_path))
+    cache.put(key(), tile(0))
+
+    image = fetch_true_color(BBOX, (64, 64), INTERVAL, EVALSCRIPT, None, cache)
+    batch = list(
+        fetch_true_color_batch(
+            {"a": (BBOX, (64, 64))},
+            INTERVAL,
+            EVALSCRIPT,
+            None,
+            cache,
+            rate_limiter=RateLimiter(1),
+        )
+    )
+
+    np.testing.assert_array_equal(image, tile(0))
+    assert [(tile_id, error) for tile_id, _, error in batch] == [("a", None)]
+
+
+def test_rate_limiter_spaces_calls():
+    """The limiter lets the first call through and spaces out the rest."""
+    limiter = RateLimiter(rate=20)
+
+    started = time.monotonic()
+    for _ in range(3):
+        limiter.wait()
+
+    assert 0.1 <= time.monotonic() - started < 0.5
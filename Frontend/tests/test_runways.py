@@ -0,0 +1,81 @@
+"""Tests of the runway detector on synthetic satellite tiles."""
+
+import numpy as np
+import pytest
+
+from runways import runway_score, runway_verdict
+
+SIZE = 1000
+
+
+def tile(angle=None, contrast=110, checkerboard=False, seed=0):
+    """
+    Draws a noisy grass-coloured tile, optionally with a runway or a busy pattern.
+
+    Args:
+        angle: Direction of the runway in degrees clockwise from north, or None.
+        contrast: Brightness of the runway over the grass.
+        checkerboard: Whether to add a field pattern full of edges.
+        seed: Seed of the noise.
+
+    Returns:
+        The tile as a uint8 RGB array.
+    """
+    rng = np.random.default_rng(seed)
+    image = rng.normal(90, 8, (SIZE, SIZE, 3))
+    ys, xs = np.mgrid[:SIZE, :SIZE] - SIZE / 2
+    if checkerboard:
+        image += ((xs // 16 + ys // 16) % 2 * 60)[..., None]
+    if angle is not None:
+        normal = np.radians(angle)
+        across = xs * np.cos(normal) + ys * np.sin(normal)
+        along = ys * np.cos(normal) - xs * np.sin(normal)
+        image[(np.abs(across) < 10) & (np.abs(along) < 360)] += contrast
+    return image.clip(0, 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize("angle", [1, 30, 91, 150])
+def test_runway_is_found_at_its_angle(angle):
+    """A long bright strip is a runway, measured along its length and direction."""
+    score = runway_score(tile(angle))
+
+    assert runway_verdict(score["confidence"]) == "runway"
+    assert score["length"] == pytest.approx(0.72, abs=0.05)
+    assert abs((score["angle"] - angle + 90) % 180 - 90) <= 1
+
+
+def test_dark_runway_is_found():
+    """Asphalt darker than its surroundings is a runway too."""
+    score = runway_score(tile(30, contrast=-50))
+
+    assert runway_verdict(score["confidence"]) == "runway"
+
+
+def test_empty_tile_is_no_runway():
+    """Noise alone has no edges and no strips."""
+    score = runway_score(tile())
+
+    assert score["confidence"] == 0
+    assert runway_verdict(score["confidence"]) == "no runway"
+
+
+def test_cluttered_tile_is_no_runway():
+    """A tile full of edges scores 0 even with a runway on it."""
+    score = runway_score(tile(30, checkerboard=True))
+
+    assert score["clutter"] > 0.15
+    assert runway_verdict(score["confidence"]) == "no runway"
+
+
+def test_grayscale_tile():
+    """Single-channel tiles are scored like RGB ones."""
+    score = runway_score(tile(30)[..., 0])
+
+    assert runway_verdict(score["confidence"]) == "runway"
+
+
+def test_runway_verdict_thresholds():
+    """Confidences between the two thresholds are left to the vision model."""
+    assert runway_verdict(0.9) == "runway"
+    assert runway_verdict(0.5) == "ambiguous"
+    assert runway_verdict(0.1) == "no runway"
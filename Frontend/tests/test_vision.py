@@ -0,0 +1,95 @@
+"""Tests of the image-description store and batching with a scripted vision model."""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from store import DiskStore
+from vision import describe_image, describe_images, open_description_store
+
+
+def scripted_client(answer):
+    """
+    Stands in for `openai.OpenAI`, answering chat completions with `answer`.
+
+    Args:
+        answer: Function from the list of images of a request to the reply text.
+
+    Returns:
+        The client, whose `requests` lists the images of every request.
+    """
+
+    def create(**request):
+        images = [
+            part["image_url"]["url"]
+            for part in request["messages"][0]["content"]
+            if part["type"] == "image_url"
+        ]
+        client.requests.append(images)
+        message = SimpleNamespace(content=answer(images))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    client = SimpleNamespace(requests=[])
+    client.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+    return client
+
+
+def labelled(images):
+    """Answers a batch request with one description per image label."""
+    return json.dumps({str(i): f"tile {url[-8:]}" for i, url in enumerate(images, 1)})
+
+
+@pytest.fixture(name="images")
+def images_fixture():
+    """Five distinct encoded tiles keyed by cell."""
+    return {f"cell{i}": bytes([0xFF, 0xD8, i]) * 100 for i in range(5)}
+
+
+def test_description_is_requested_once(images, tmp_path):
+    """A described image is read from the store the next time."""
+    store = open_description_store(str(tmp_path / "descriptions.db"))
+    client = scripted_client(lambda images: "An airfield.")
+
+    for _ in range(2):
+        description = describe_image(images["cell0"], store, client)
+
+    assert description == "An airfield."
+    assert len(client.requests) == 1
+
+
+def test_images_are_described_in_batches(images, tmp_path):
+    """Missing images go out batch_size at a time and fill the shared store."""
+    store = open_description_store(str(tmp_path / "descriptions.db"))
+    describe_image(images["cell0"], store, scripted_client(lambda images: "Cached."))
+    client = scripted_client(labelled)
+
+    descriptions = describe_images(images, store, client, batch_size=2)
+
+    assert descriptions["cell0"] == "Cached."
+    assert [len(request) for request in client.requests] == [2, 2]
+    assert describe_image(images["cell3"], store, client) == descriptions["cell3"]
+    assert len(client.requests) == 2
+
+
+def test_unparsable_batch_falls_back_to_single_requests(images, tmp_path):
+    """Images without a usable batch answer are described one by one."""
+    store = open_description_store(str(tmp_path / "descriptions.db"))
+    client = scripted_client(lambda images: "An airfield." if len(images) == 1 else "{")
+
+    descriptions = describe_images(dict(list(images.items())[:3]), store, client)
+
+    assert set(descriptions.values()) == {"An airfield."}
+    assert [len(request) for request in client.requests] == [3, 1, 1, 1]
+
+
+def test_store_evicts_least_recently_read(tmp_path):
+    """A full store drops the entry that was read longest ago."""
+    store = DiskStore(str(tmp_path / "store.db"), max_entries=2)
+    store.put("a", "A")
+    store.put("b", "B")
+    store.get("a")
+
+    store.put("c", "C")
+
+    assert store.fresh_keys() == {"a", "c"}
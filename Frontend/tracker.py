@@ -22,19 +22,52 @@ This script relies on several external libraries:
 """
 
 import os
-import json
+from urllib.parse import quote
 import requests
 
 import streamlit as st
 import h3
-import geopandas as gpd
-from utils import hexagons_dataframe_to_geojson, cell_to_shapely
+import pandas as pd
+from utils import (
+    fetch_map,
+    hexagons_to_geojson,
+    map_view_inputs,
+    shared_dataset,
+    viewport_bbox,
+)
 from streamlit_plotly_events import plotly_events
 import plotly.graph_objs as go
 from sentinelhub import SHConfig
-from bs4 import BeautifulSoup as BS
+from aircraft import lookup_aircraft_type, open_aircraft_store
+from client import backend_client
 
 
+@st.cache_resource
+def aircraft_store():
+    """Opens the aircraft-type store once per Streamlit process."""
+    return open_aircraft_store()
+
+
+def plane_info(plane, store, session):
+    """
+    Looks up an aircraft type for the "Plane Lookup" section.
+
+    Any failure, including a Skybrary page that cannot be parsed or a store
+    error, only leaves that section without a description.
+
+    Args:
+        plane: The aircraft type designator.
+        store: The aircraft-type store.
+        session: A `requests` session to fetch with.
+
+    Returns:
+        A dict with "name" and "description", or None if the type cannot be looked up.
+    """
+    try:
+        return lookup_aircraft_type(plane, store, session)
+    except Exception:
+        return None
+
 
 def tracker():
 
@@ -51,7 +84,7 @@ def tracker():
     st.title("Data Visualization Page")
     st.subheader("Choose a Distance, Hex Resolution and 'Level of Significance'")
 
-    geo_dataframe = st.session_state['tracker_geo_dataframe.pkl']
+    dataset = shared_dataset()
 
 
     DISTANCE = int(st.radio("Distance", ["500", "100", "200", "300", "400", "50"]))
@@ -62,33 +95,52 @@ def tracker():
 
     SIGNIFICANCE = st.number_input("Significance", 0, 1000, value=1)
 
+    # Only the hexes in view are fetched, the backend lowers the resolution to
+    # what the zoom can show
+    center_lat, center_lon, zoom = map_view_inputs()
 
-    params = {"Distance": DISTANCE, "Resolution": RESOLUTION, "Significance": SIGNIFICANCE}
 
-    actual_url = "http://airport_fastapi_route:5001/map"
+    params = {
+        "Distance": DISTANCE,
+        "Resolution": RESOLUTION,
+        "Significance": SIGNIFICANCE,
+        "Viewport": viewport_bbox(center_lat, center_lon, zoom),
+        "Zoom": zoom,
+    }
 
+    client = backend_client()
 
-    if SIGNIFICANCE >= 0:
+    # The "Plane Lookup" selection of the last run, so its aircraft type can be
+    # looked up while the map is downloading
+    unique_types = dataset["type"].unique()
+    prefetched_plane = st.session_state.get("plane_lookup", unique_types[0])
+    store = aircraft_store()
 
-        response = requests.post(actual_url, json={"data": params}, timeout=10)
 
-        if response.status_code == 200:
-            try:
-                result = response.json()
-                geojson_obj_h3_gdf = result.get("geojson_obj_h3_gdf")
-                h3_gdf = json.loads(result.get("h3_gdf"))
-                h3_gdf = gpd.GeoDataFrame.from_features(h3_gdf["features"])
+    if SIGNIFICANCE >= 0:
 
-            except requests.exceptions.JSONDecodeError:
-                st.error("Error: The response is not in JSON format.")
-                st.write("Response content:", response.text)
+        try:
+            (h3_df, geojson_obj_h3_gdf, resolution), aircraft_info = client.gather(
+                lambda: fetch_map(client, params),
+                lambda: plane_info(prefetched_plane, store, client.session),
+            )
+        except (requests.exceptions.RequestException, ValueError) as e:
+            st.error(f"Error: could not load the map data ({e}).")
+            st.stop()
+
+    if resolution != RESOLUTION:
+        st.caption(
+            f"Resolution {RESOLUTION} is too fine to draw at zoom {zoom}, showing "
+            f"resolution {resolution}. Zoom in for finer hexes."
+        )
+        RESOLUTION = resolution
 
     fig2 = go.Figure(
         data=[
             go.Choroplethmapbox(
                 geojson=geojson_obj_h3_gdf,
-                locations=h3_gdf[f"H3_{RESOLUTION}_cell"],
-                z=h3_gdf["count"],
+                locations=h3_df[f"H3_{RESOLUTION}_cell"],
+                z=h3_df["count"],
                 zmax=50,
                 zmin=0,
                 colorscale="inferno",
@@ -101,8 +153,8 @@ def tracker():
         ],
         layout=go.Layout(
             mapbox_style="open-street-map",
-            mapbox_center={"lat": 27.842490, "lon": -82.503222},
-            mapbox_zoom=8,
+            mapbox_center={"lat": center_lat, "lon": center_lon},
+            mapbox_zoom=zoom,
             margin={"r": 0, "t": 0, "l": 0, "b": 0},
         ),
     )
@@ -121,22 +173,19 @@ def tracker():
         h3cell_id_list.append(h3cell_id)
 
     try:
-        cell_gdf = geo_dataframe[
-            geo_dataframe[f"H3_{RESOLUTION}_cell"] == h3cell_id_list[0]
-        ]
+        if not h3cell_id_list:
+            raise ValueError("No hex selected")
 
-        flights_in_hex = cell_gdf["flight"].unique()
-
-        flights_in_hex_gdf = geo_dataframe[geo_dataframe["flight"].isin(flights_in_hex)]
-        types_in_hex = cell_gdf["type"].unique()
-
-        st.write("Total Observations of flights within selected hex:")
-        st.write(
-            flights_in_hex_gdf.groupby(["flight", "type"])
-            .size()
-            .reset_index(name="count")
-            .sort_values(by="count", ascending=False)
+        response = client.get(
+            "/cells/flights",
+            params={"resolution": RESOLUTION, "cells": h3cell_id_list},
         )
+        hex_flights = response.json()
+        flights_in_hex = hex_flights["flights"]
+        types_in_hex = hex_flights["types"]
+
+        st.write("Total Observations of flights within selected hexes:")
+        st.write(pd.DataFrame(hex_flights["observations"]))
 
         selected_flight = st.selectbox("Select a flight to track", tuple(flights_in_hex))
 
@@ -144,38 +193,24 @@ def tracker():
 
         st.write(f"You selected flight: {selected_flight}")
 
-        selected_f_gdf = geo_dataframe[
-            (geo_dataframe[f"flight"] == selected_flight)
-            & (geo_dataframe["type"] == selected_type)
-        ]
+        track_path = f"/flights/{quote(selected_flight, safe='')}/track"
+        track_params = {"type": selected_type, "resolution": RESOLUTION}
 
         st.write("Please select a starting and end date.")
-        flight_dates = list(selected_f_gdf["timestamp"].dt.date.unique())
+        response = client.get(track_path, params=track_params)
+        flight_dates = response.json()["dates"]
         start_date = st.radio("Start date", flight_dates)
         end_date = st.radio("End date", flight_dates)
 
-        flight_date_gdf = selected_f_gdf[
-            (selected_f_gdf["timestamp"].dt.date >= start_date)
-            & (selected_f_gdf["timestamp"].dt.date <= end_date)
-        ]
-
-        first_timestamp = flight_date_gdf["timestamp"].min()
-        flight_date_gdf["time_from_start"] = (
-            flight_date_gdf["timestamp"] - first_timestamp
-        ).dt.total_seconds() / 3600
-
-        flight_date_geoms = flight_date_gdf[f"H3_{RESOLUTION}_cell"].apply(
-            lambda x: cell_to_shapely(x)
-        )
-        h3_gdf_plane = gpd.GeoDataFrame(
-            data=flight_date_gdf, geometry=flight_date_geoms, crs=4326
+        response = client.get(
+            track_path,
+            params={**track_params, "start": start_date, "end": end_date},
         )
+        flight_date_gdf = pd.DataFrame(response.json()["track"])
 
-        geojson_obj_h3_gdf_plane = hexagons_dataframe_to_geojson(
-            h3_gdf_plane,
-            hex_id_field=f"H3_{RESOLUTION}_cell",
-            value_field="time_from_start",
-            geometry_field="geometry",
+        geojson_obj_h3_gdf_plane = hexagons_to_geojson(
+            flight_date_gdf[f"H3_{RESOLUTION}_cell"],
+            flight_date_gdf["time_from_start"],
         )
         try:
             mb_center = h3.cell_to_latlng(flight_date_gdf[f"H3_{RESOLUTION}_cell"].iloc[0])
@@ -213,25 +248,13 @@ def tracker():
 
     st.subheader("Plane Lookup")
 
-    unique_types = st.session_state["tracker_geo_dataframe.pkl"]['type'].unique()
-
-    plane = st.selectbox("Select a plane type to look up!", tuple(unique_types))
-
-    url = f'https://skybrary.aero/aircraft/{str(plane).lower()}'
-    response = requests.get(url)
-    soup = BS(response.text, 'html.parser')
-
-    json_ld_script = soup.find('script', type='application/ld+json')
-
-    if json_ld_script:
-        # Parse the JSON data
-        data = json.loads(json_ld_script.string)
-        # Extract the name and description
-        for item in data.get("@graph", []):
-            if item["@type"] == "Article":
-                name = item.get("name", "No name found")
-                description = item.get("description", "No description found")
-                st.write(f"#### {name}")
-                st.write(f"{description}")
+    plane = st.selectbox(
+        "Select a plane type to look up!", tuple(unique_types), key="plane_lookup"
+    )
+    if plane != prefetched_plane:
+        aircraft_info = plane_info(plane, store, client.session)
+    if aircraft_info:
+        st.write(f"#### {aircraft_info['name']}")
+        st.write(f"{aircraft_info['description']}")
     else:
         st.write("Plane type not found in 'Skylibrary' database.")
@@ -4,16 +4,23 @@ Utils imports
 
 from __future__ import annotations
 from typing import Any
-from collections import Counter
+from functools import lru_cache
+import io
 import json
+import math
+import os
 
-from geojson import Feature, FeatureCollection
 import h3
+import shapely
 from shapely.geometry import Polygon
 import matplotlib.pyplot as plt
 import numpy as np
+import pandas as pd
+import pyarrow as pa
 import geopandas as gpd
 import streamlit as st
+from PIL import Image
+from dataset import h3_to_str, open_dataset
 
 
 
@@ -42,43 +49,122 @@ def plot_image(
     ax.set_yticks([])
 
 
+def image_to_uint8(
+    image: np.ndarray,
+    factor: float = 1.0,
+    clip_range: tuple[float, float] | None = None,
+) -> np.ndarray:
+    """
+    Scales and clips an RGB image and converts it to 8-bit pixels.
+
+    Like `plt.imshow`, a scaled image is taken to be in [0, 1].
+
+    Args:
+        image: The image as a NumPy array.
+        factor: A scaling factor to apply to the image.
+        clip_range: A tuple of (min, max) values to clip the image intensities.
+
+    Returns:
+        The image as a uint8 NumPy array.
+    """
+    if factor == 1 and clip_range is None and np.issubdtype(image.dtype, np.integer):
+        return image.astype(np.uint8, copy=False)
+
+    scaled = image.astype(np.float32) * np.float32(factor)
+    if clip_range is not None:
+        np.clip(scaled, *clip_range, out=scaled)
+    np.clip(scaled, 0, 1, out=scaled)
+    scaled *= 255
+    scaled += 0.5
+    return scaled.astype(np.uint8)
+
+
+def encode_image(
+    image: np.ndarray,
+    factor: float = 1.0,
+    clip_range: tuple[float, float] | None = None,
+    image_format: str = "JPEG",
+    quality: int = 90,
+) -> bytes:
+    """
+    Encodes an RGB image to JPEG or PNG bytes in memory.
+
+    Args:
+        image: The image as a NumPy array.
+        factor: A scaling factor to apply to the image.
+        clip_range: A tuple of (min, max) values to clip the image intensities.
+        image_format: "JPEG" or "PNG".
+        quality: JPEG quality, from 1 to 95.
+
+    Returns:
+        The encoded image.
+    """
+    buffer = io.BytesIO()
+    Image.fromarray(image_to_uint8(image, factor, clip_range)).save(
+        buffer, format=image_format, quality=quality
+    )
+    return buffer.getvalue()
+
+
 def st_plot_image(
     image: np.ndarray,
     factor: float = 1.0,
     clip_range: tuple[float, float] | None = None,
-    filename: str = "image.jpg",
+    image_format: str = "JPEG",
     **kwargs: Any,
-) -> str:
-    """Utility function for plotting RGB images in a Streamlit app using Matplotlib.
+) -> bytes:
+    """Utility function for showing RGB images in a Streamlit app.
+
+    The image is encoded once in memory, so the same bytes can be sent to the
+    browser and, base64 encoded, to a vision model.
 
     Args:
-        image: The image to plot as a NumPy array.
+        image: The image to show as a NumPy array.
         factor: A scaling factor to apply to the image.
         clip_range: A tuple specifying the minimum and maximum values to clip the image to.
-        filename: The desired filename for the saved image.
-        **kwargs: Additional keyword arguments to pass to `plt.imshow`.
+        image_format: "JPEG" or "PNG".
+        **kwargs: Additional keyword arguments to pass to `st.image`.
 
     Returns:
-        The path to the saved image file.
+        The encoded image.
     """
+    data = encode_image(
+        image, factor=factor, clip_range=clip_range, image_format=image_format
+    )
+    st.image(data, **kwargs)
+    return data
 
-    if clip_range is not None:
-        image = np.clip(image * factor, *clip_range)
-    else:
-        image = image * factor
-
-    # Create a Matplotlib figure
-    fig, ax = plt.subplots(figsize=(10, 10))  # Adjust figure size as needed
-    ax.imshow(image, **kwargs)
-    ax.axis("off")  # Turn off axis labels and ticks
 
-    # Save the image to the specified filename
-    plt.savefig(filename)
+def hexagons_to_geojson(hex_ids, values, decimals=None):
+    """
+    Builds a GeoJSON FeatureCollection of hexagons from column arrays.
 
-    # Display the Matplotlib figure in Streamlit
-    st.pyplot(fig)
+    Args:
+        hex_ids: Sequence of H3 cell IDs, one per feature.
+        values: Sequence of values to associate with each hexagon.
+        decimals: Optional number of decimals to round the coordinates to.
 
-    return filename
+    Returns:
+        A GeoJSON FeatureCollection dict.
+    """
+    hex_ids = hex_ids.tolist() if hasattr(hex_ids, "tolist") else list(hex_ids)
+    values = values.tolist() if hasattr(values, "tolist") else list(values)
+
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "id": hex_id,
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [cell_boundary(hex_id, decimals)],
+                },
+                "properties": {"value": value},
+            }
+            for hex_id, value in zip(hex_ids, values)
+        ],
+    }
 
 
 def hexagons_dataframe_to_geojson(
@@ -90,7 +176,7 @@ def hexagons_dataframe_to_geojson(
     Args:
         df_hex: The GeoDataFrame containing hexagon data.
         hex_id_field: The name of the column in `df_hex` containing hexagon IDs.
-        geometry_field: The name of the column in `df_hex` containing the geometry.
+        geometry_field: Unused; hexagon geometry is derived from the hexagon IDs.
         value_field: The name of the column in `df_hex` containing the value to be associated
             with each hexagon.
         file_output: Optional file path to save the GeoJSON to.
@@ -98,18 +184,7 @@ def hexagons_dataframe_to_geojson(
     Returns:
         A GeoJSON FeatureCollection object.
     """
-
-    list_features = []
-
-    for i, row in df_hex.iterrows():
-        feature = Feature(
-            geometry=row[geometry_field],
-            id=row[hex_id_field],
-            properties={"value": row[value_field]},
-        )
-        list_features.append(feature)
-
-    feat_collection = FeatureCollection(list_features)
+    feat_collection = hexagons_to_geojson(df_hex[hex_id_field], df_hex[value_field])
 
     if file_output is not None:
         with open(file_output, "w") as f:
@@ -119,6 +194,30 @@ def hexagons_dataframe_to_geojson(
         return feat_collection
 
 
+# About 1 KB per boundary, so roughly 50 MB per process when full
+H3_BOUNDARY_CACHE_SIZE = 50_000
+
+
+@lru_cache(maxsize=H3_BOUNDARY_CACHE_SIZE)
+def cell_boundary(cell, decimals=None):
+    """
+    Returns the closed (lon, lat) boundary ring of an H3 cell.
+
+    Boundaries are cached process-wide, so hot cells are only computed once.
+
+    Args:
+        cell: The H3 cell ID.
+        decimals: Optional number of decimals to round the coordinates to.
+
+    Returns:
+        A tuple of (lon, lat) coordinate pairs, with the first pair repeated at the end.
+    """
+    ring = tuple((lng, lat) for lat, lng in h3.cell_to_boundary(cell))
+    if decimals is not None:
+        ring = tuple((round(lng, decimals), round(lat, decimals)) for lng, lat in ring)
+    return ring + ring[:1]
+
+
 def cell_to_shapely(cell):
     """
     Converts an H3 cell ID to a Shapely Polygon.
@@ -129,9 +228,26 @@ def cell_to_shapely(cell):
     Returns:
         A Shapely Polygon object representing the hexagon.
     """
-    coords = h3.cell_to_boundary(cell)
-    flipped = tuple(coord[::-1] for coord in coords)
-    return Polygon(flipped)
+    return Polygon(cell_boundary(cell))
+
+
+def cells_to_shapely(hex_ids, decimals=None):
+    """
+    Converts a sequence of H3 cell IDs to Shapely Polygons in one vectorized call.
+
+    Args:
+        hex_ids: Sequence of H3 cell IDs.
+        decimals: Optional number of decimals to round the coordinates to.
+
+    Returns:
+        A NumPy array of Shapely Polygon objects, one per cell.
+    """
+    rings = [cell_boundary(hex_id, decimals) for hex_id in hex_ids]
+    if not rings:
+        return np.empty(0, dtype=object)
+    coords = np.concatenate(rings)
+    ring_index = np.repeat(np.arange(len(rings)), [len(ring) for ring in rings])
+    return shapely.polygons(shapely.linearrings(coords, indices=ring_index))
 
 
 def center_to_bbox(center_lat, center_lon, x_adjust, y_adjust):
@@ -179,17 +295,40 @@ def cellToBbox(cell_id, x_adjust, y_adjust):
     return center_to_bbox(center[1], center[0], x_adjust, y_adjust)
 
 
-def count_categories(categories):
+ADSB_CATEGORIES = [f"{group}{number}" for group in "ABC" for number in range(8)]
+
+
+def count_categories(Geom_DF, hex_id_field):
     """
-    Counts the occurrences of each category in a list.
+    Counts points and ADS-B categories per H3 cell in a single vectorized pass.
 
     Args:
-        categories: A list of categories.
+        Geom_DF: GeoDataFrame containing a `category` column and the hex id column.
+        hex_id_field: The name of the column in `Geom_DF` containing hexagon IDs,
+            as integers or strings.
 
     Returns:
-        A Counter object containing category counts.
+        A DataFrame with one row per H3 cell (IDs as in `Geom_DF`), its point
+        count, and one integer column per ADS-B category in `ADSB_CATEGORIES`.
     """
-    return Counter(categories)
+    cell_codes, cells = pd.factorize(Geom_DF[hex_id_field], sort=True)
+    category_codes = pd.Categorical(
+        Geom_DF["category"], categories=ADSB_CATEGORIES
+    ).codes
+
+    has_cell = cell_codes >= 0
+    has_category = has_cell & (category_codes >= 0)
+    n_categories = len(ADSB_CATEGORIES)
+
+    category_counts = np.bincount(
+        cell_codes[has_category] * n_categories + category_codes[has_category],
+        minlength=len(cells) * n_categories,
+    ).reshape(len(cells), n_categories)
+
+    h3_df = pd.DataFrame(category_counts, columns=ADSB_CATEGORIES)
+    h3_df.insert(0, "count", np.bincount(cell_codes[has_cell], minlength=len(cells)))
+    h3_df.insert(0, hex_id_field, cells)
+    return h3_df
 
 
 def make_dfs(DISTANCE, RESOLUTION, SIGNIFICANCE, Geom_DF):
@@ -211,25 +350,231 @@ def make_dfs(DISTANCE, RESOLUTION, SIGNIFICANCE, Geom_DF):
 
     Geom_DF = Geom_DF[Geom_DF["distance"] <= DISTANCE / 69]
 
-    h3_df = (
-        Geom_DF.groupby(f"H3_{RESOLUTION}_cell")
-        .agg(
-            count=(f"H3_{RESOLUTION}_cell", "size"),
-            category_counts=("category", count_categories),
-        )
-        .reset_index()
-    )
+    h3_df = count_categories(Geom_DF, f"H3_{RESOLUTION}_cell")
 
     h3_df = h3_df[h3_df["count"] >= SIGNIFICANCE]
 
-    h3_geoms = h3_df[f"H3_{RESOLUTION}_cell"].apply(lambda x: cell_to_shapely(x))
+    hex_id_field = f"H3_{RESOLUTION}_cell"
+    h3_df = h3_df.assign(**{hex_id_field: h3_to_str(h3_df[hex_id_field])})
+    hex_ids = h3_df[hex_id_field]
+    h3_geoms = cells_to_shapely(hex_ids)
     h3_gdf = gpd.GeoDataFrame(data=h3_df, geometry=h3_geoms, crs=4326)
 
-    geojson_obj_h3_gdf = hexagons_dataframe_to_geojson(
-        h3_gdf,
-        hex_id_field=f"H3_{RESOLUTION}_cell",
-        value_field="count",
-        geometry_field="geometry",
+    geojson_obj_h3_gdf = hexagons_to_geojson(hex_ids, h3_df["count"])
+
+    return (h3_df, h3_gdf, geojson_obj_h3_gdf)
+
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+MAP_IDS_MEDIA_TYPE = "application/vnd.adsb-map-ids+json"
+
+MAP_RESOLUTIONS = (6, 7, 8, 9, 10, 11)
+MAP_MIN_HEX_PIXELS = 4
+# Metres per pixel at zoom 0 on the equator, for the 512 px tiles of Mapbox GL
+MAPBOX_METERS_PER_PIXEL = 78271.517
+MAP_CENTER = (27.842490, -82.503222)
+MAP_ZOOM = 8
+# Plotly's default figure size, which the map is drawn at
+MAP_VIEW_SIZE = (700, 450)
+
+
+def max_resolution_for_zoom(zoom, lat=0.0, resolutions=MAP_RESOLUTIONS):
+    """
+    Picks the finest H3 resolution still legible at a map zoom level.
+
+    The backend caps /map requests with the same rule.
+
+    Args:
+        zoom: The Mapbox zoom level.
+        lat: Latitude of the view, which sets the map scale.
+        resolutions: The resolutions to choose from.
+
+    Returns:
+        The finest resolution whose hexagons are at least MAP_MIN_HEX_PIXELS
+        wide, or the coarsest one if none is.
+    """
+    meters_per_pixel = MAPBOX_METERS_PER_PIXEL * math.cos(math.radians(lat)) / 2**zoom
+    legible = [
+        resolution
+        for resolution in resolutions
+        if 2 * h3.average_hexagon_edge_length(resolution, unit="m")
+        >= MAP_MIN_HEX_PIXELS * meters_per_pixel
+    ]
+    return max(legible, default=min(resolutions))
+
+
+def viewport_bbox(center_lat, center_lon, zoom, size=MAP_VIEW_SIZE):
+    """
+    Computes the area a Mapbox map shows.
+
+    Args:
+        center_lat: Latitude of the map center.
+        center_lon: Longitude of the map center.
+        zoom: The Mapbox zoom level.
+        size: (width, height) of the map in pixels.
+
+    Returns:
+        A [min_lon, min_lat, max_lon, max_lat] list.
+    """
+    width, height = size
+    world = 512 * 2**zoom  # pixels around the world at this zoom
+    half_lon = width / 2 * 360 / world
+    # Latitudes are spaced evenly in Web Mercator y, not in degrees
+    y = math.log(math.tan(math.pi / 4 + math.radians(center_lat) / 2))
+    half_y = height / 2 * 2 * math.pi / world
+
+    def to_lat(mercator_y):
+        return math.degrees(2 * math.atan(math.exp(mercator_y)) - math.pi / 2)
+
+    return [
+        center_lon - half_lon,
+        to_lat(y - half_y),
+        center_lon + half_lon,
+        to_lat(y + half_y),
+    ]
+
+
+def map_view_inputs():
+    """
+    Shows the inputs that place the hexagon map.
+
+    Returns:
+        A tuple of (center_lat, center_lon, zoom).
+    """
+    lat_column, lon_column, zoom_column = st.columns(3)
+    center_lat = lat_column.number_input(
+        "Map center latitude", -85.0, 85.0, value=MAP_CENTER[0], format="%.4f"
     )
+    center_lon = lon_column.number_input(
+        "Map center longitude", -180.0, 180.0, value=MAP_CENTER[1], format="%.4f"
+    )
+    zoom = zoom_column.slider("Map zoom", 4, 16, value=MAP_ZOOM)
+    return center_lat, center_lon, zoom
+
+
+def read_map_payload(response, RESOLUTION):
+    """
+    Decodes a /map response into the H3 cell table and its GeoJSON.
+
+    Arrow and IDs-only JSON responses carry no geometry: the hexagons are
+    rebuilt locally from the cell IDs through the cached boundary table of
+    `cell_boundary`. Full JSON responses from older backends are still understood.
+
+    Args:
+        response: The `requests` response of a POST to the /map endpoint.
+        RESOLUTION: H3 resolution the map was requested at, used when the
+            response has no X-H3-Resolution header.
+
+    Returns:
+        A tuple containing:
+            - h3_df: Aggregated H3 cell data as a DataFrame, with hex-string cell IDs.
+            - geojson_obj_h3_gdf: GeoJSON FeatureCollection of H3 cells.
+            - resolution: H3 resolution of the cells, which the backend may have
+              lowered to what the zoom can show.
+    """
+    RESOLUTION = int(response.headers.get("X-H3-Resolution", RESOLUTION))
+    hex_id_field = f"H3_{RESOLUTION}_cell"
+
+    content_type = response.headers.get("content-type", "")
+    if content_type.startswith(ARROW_MEDIA_TYPE):
+        reader = pa.ipc.open_stream(pa.py_buffer(response.content))
+        h3_df = reader.read_pandas()
+        h3_df[hex_id_field] = [
+            h3.int_to_str(hex_id) for hex_id in h3_df[hex_id_field].tolist()
+        ]
+        geojson = hexagons_to_geojson(h3_df[hex_id_field], h3_df["count"])
+        return h3_df, geojson, RESOLUTION
+
+    if content_type.startswith(MAP_IDS_MEDIA_TYPE):
+        h3_df = pd.DataFrame(response.json()["columns"])
+        geojson = hexagons_to_geojson(h3_df[hex_id_field], h3_df["count"])
+        return h3_df, geojson, RESOLUTION
+
+    result = response.json()
+    if "h3_df" not in result:
+        raise ValueError(result.get("Error during map making", "Unexpected /map response"))
+    h3_df = pd.read_json(io.StringIO(result.get("h3_df")))
+    return h3_df, result.get("geojson_obj_h3_gdf"), RESOLUTION
+
+
+def fetch_map(client, params):
+    """
+    Requests map data from the backend, revalidating the session's last copy.
+
+    The last map payload is kept in `st.session_state` with its ETag. When the
+    backend answers 304 Not Modified, that copy is reused and nothing is downloaded.
+
+    Args:
+        client: The BackendClient to request with.
+        params: Dict with the "Distance", "Resolution" and "Significance" to
+            request, and optionally the "Viewport" and "Zoom" of the map.
+
+    Returns:
+        A tuple of (h3_df, geojson_obj_h3_gdf, resolution), see `read_map_payload`.
+
+    Raises:
+        requests.exceptions.RequestException: If the request fails.
+        ValueError: If the backend reports an error while making the map.
+    """
+    key = (client.url("/map"), tuple(sorted(params.items())))
+    cached = st.session_state.get("map_payload")
+
+    # Both carry cell IDs only; Arrow is preferred as the faster to decode
+    headers = {"Accept": f"{ARROW_MEDIA_TYPE}, {MAP_IDS_MEDIA_TYPE};q=0.9"}
+    if cached is not None and cached["key"] == key:
+        headers["If-None-Match"] = cached["etag"]
+
+    response = client.post("/map", json={"data": params}, headers=headers)
+    if response.status_code == 304:
+        return cached["payload"]
+    response.raise_for_status()
+
+    payload = read_map_payload(response, params["Resolution"])
+    etag = response.headers.get("etag")
+    if etag is not None:
+        st.session_state["map_payload"] = {"key": key, "etag": etag, "payload": payload}
+    return payload
+
 
-    return (h3_df, h3_gdf, geojson_obj_h3_gdf)
\ No newline at end of file
+DATASET_PATH = os.environ.get("ADSB_DATASET", "adsb_data.arrow")
+
+
+@st.cache_resource(max_entries=1)
+def open_shared_dataset(path, version):
+    """
+    Opens the dataset once per process and version of the file.
+
+    Args:
+        path: Path to the Arrow dataset.
+        version: The (mtime, size) of the file, so a new file gets a new handle.
+
+    Returns:
+        A read-only ColumnarDataset.
+    """
+    return open_dataset(path)
+
+
+def shared_dataset(path=DATASET_PATH):
+    """
+    Returns the read-only dataset shared by every session of this Streamlit process.
+
+    The handle is replaced as a whole when the file changes on disk, and sessions
+    only keep their selections in `st.session_state`. The file is written by
+    Database/make_db.py and converted by the backend; the frontend only reads it.
+
+    Args:
+        path: Path to the Arrow dataset.
+
+    Returns:
+        A read-only ColumnarDataset.
+    """
+    try:
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        version = None
+    try:
+        return open_shared_dataset(path, version)
+    except (FileNotFoundError, ValueError) as e:
+        st.error(f"Error: the ADS-B dataset is not ready ({e}).")
+        st.stop()
@@ -0,0 +1,200 @@
+"""
+Descriptions of satellite tiles by a vision model, cached on disk.
+
+A description is keyed by the SHA-256 of the image bytes, the prompt and the
+model, so pressing the button again on a byte-identical tile reads the stored
+text instead of calling the API. The store keeps the VISION_STORE_MAX_ENTRIES
+most recently read descriptions.
+
+`describe_images` sends several tiles in one request when many hexes are being
+reviewed, and falls back to one request per tile for any answer it cannot parse.
+
+The OpenAI client reads OPENAI_API_KEY and OPENAI_BASE_URL from the environment,
+so the API can be pointed at a local mock.
+"""
+
+import base64
+import hashlib
+import json
+import os
+
+from store import DiskStore
+
+VISION_MODEL = os.environ.get("VISION_MODEL", "gpt-4o-mini")
+VISION_PROMPT = "Tell me about this image."
+VISION_MAX_TOKENS = 300
+VISION_BATCH_SIZE = 4
+VISION_STORE_PATH = os.environ.get("VISION_STORE", "image_descriptions.db")
+VISION_STORE_MAX_ENTRIES = int(os.environ.get("VISION_STORE_MAX_ENTRIES", 10000))
+
+
+def open_description_store(path=VISION_STORE_PATH):
+    """
+    Opens the on-disk description store.
+
+    Args:
+        path: Path to the store's SQLite file.
+
+    Returns:
+        A DiskStore holding at most VISION_STORE_MAX_ENTRIES descriptions.
+    """
+    return DiskStore(path, max_entries=VISION_STORE_MAX_ENTRIES)
+
+
+def description_key(image_bytes, prompt=VISION_PROMPT, model=VISION_MODEL):
+    """
+    Computes the store key of one image description.
+
+    Args:
+        image_bytes: The encoded image.
+        prompt: The prompt the image is described with.
+        model: The vision model.
+
+    Returns:
+        The hex SHA-256 key.
+    """
+    digest = hashlib.sha256()
+    for part in (image_bytes, prompt.encode(), model.encode()):
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def image_content(image_bytes, media_type="image/jpeg"):
+    """
+    Builds the chat message part carrying one image.
+
+    Args:
+        image_bytes: The encoded image.
+        media_type: The image's MIME type.
+
+    Returns:
+        A dict for the "content" list of a chat message.
+    """
+    base64_image = base64.b64encode(image_bytes).decode("utf-8")
+    return {
+        "type": "image_url",
+        "image_url": {"url": f"data:{media_type};base64,{base64_image}"},
+    }
+
+
+def describe_image(
+    image_bytes,
+    store,
+    client,
+    prompt=VISION_PROMPT,
+    model=VISION_MODEL,
+    max_tokens=VISION_MAX_TOKENS,
+):
+    """
+    Describes one image, from the store when it was described before.
+
+    Args:
+        image_bytes: The encoded JPEG image.
+        store: The DiskStore from `open_description_store`.
+        client: An `openai.OpenAI` client.
+        prompt: The prompt the image is described with.
+        model: The vision model.
+        max_tokens: Maximum length of the description.
+
+    Returns:
+        The description text.
+    """
+    key = description_key(image_bytes, prompt, model)
+    description = store.get(key)
+    if description is None:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt},
+                        image_content(image_bytes),
+                    ],
+                }
+            ],
+            max_tokens=max_tokens,
+        )
+        description = response.choices[0].message.content
+        store.put(key, description)
+    return description
+
+
+def describe_images(
+    images,
+    store,
+    client,
+    prompt=VISION_PROMPT,
+    model=VISION_MODEL,
+    max_tokens=VISION_MAX_TOKENS,
+    batch_size=VISION_BATCH_SIZE,
+):
+    """
+    Describes several images, sending up to `batch_size` of them per request.
+
+    Images are labelled 1..n in each request and the model answers with a JSON
+    object from label to description. Each description is stored under the same
+    key `describe_image` uses, so single and batch lookups share the store.
+
+    Args:
+        images: A dict mapping an image ID (e.g. the H3 cell) to its encoded JPEG.
+        store: The DiskStore from `open_description_store`.
+        client: An `openai.OpenAI` client.
+        prompt: The prompt each image is described with.
+        model: The vision model.
+        max_tokens: Maximum length of one description.
+        batch_size: Maximum number of images per request.
+
+    Returns:
+        A dict mapping each image ID to its description.
+    """
+    descriptions = {}
+    missing = []
+    for image_id, image_bytes in images.items():
+        key = description_key(image_bytes, prompt, model)
+        description = store.get(key)
+        if description is None:
+            missing.append((image_id, key))
+        else:
+            descriptions[image_id] = description
+
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start : start + batch_size]
+        content = [
+            {
+                "type": "text",
+                "text": (
+                    f"{prompt} There are {len(batch)} images, labelled 1 to "
+                    f"{len(batch)} in order. Answer with a JSON object that maps "
+                    "each label to the description of its image."
+                ),
+            }
+        ]
+        for label, (image_id, _) in enumerate(batch, start=1):
+            content.append({"type": "text", "text": f"Image {label}:"})
+            content.append(image_content(images[image_id]))
+
+        response = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": content}],
+            max_tokens=max_tokens * len(batch),
+            response_format={"type": "json_object"},
+        )
+        try:
+            answers = json.loads(response.choices[0].message.content)
+        except (TypeError, ValueError):
+            answers = {}
+        if not isinstance(answers, dict):
+            answers = {}
+
+        for label, (image_id, key) in enumerate(batch, start=1):
+            description = answers.get(str(label))
+            if isinstance(description, str):
+                store.put(key, description)
+                descriptions[image_id] = description
+            else:
+                descriptions[image_id] = describe_image(
+                    images[image_id], store, client, prompt, model, max_tokens
+                )
+    return descriptions